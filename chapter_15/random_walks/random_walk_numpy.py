@@ -0,0 +1,163 @@
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from random_walk import RandomWalk
+
+
+class NumpyRandomWalk(RandomWalk):
+    """A random walk that takes all of its steps at once, using NumPy."""
+
+    def __init__(self, num_points=5000, seed=None):
+        """Initialize attributes of a walk.
+
+        Walks made with the same seed are identical.
+        """
+        if num_points < 0:
+            raise ValueError(f"num_points can't be negative: {num_points}")
+        super().__init__(num_points)
+        self.rng = np.random.default_rng(seed)
+
+    def fill_walk(self):
+        """Calculate all the points in the walk."""
+        num_points = self.get_num_points()
+
+        # Take every step at once.
+        x_steps, y_steps = self.get_steps(num_points - 1)
+
+        # Each position is the sum of all the steps before it.
+        #   All walks start at (0, 0).
+        dtype = self.get_dtype()
+        self.x_values = np.zeros(num_points, dtype=dtype)
+        self.y_values = np.zeros(num_points, dtype=dtype)
+        np.cumsum(x_steps, dtype=dtype, out=self.x_values[1:])
+        np.cumsum(y_steps, dtype=dtype, out=self.y_values[1:])
+
+    def iter_chunks(self, chunk_size=1_000_000):
+        """Yield the points in the walk as x and y arrays, chunk_size
+          points at a time.
+
+        Only one chunk is in memory at a time, so a walk can be much
+          longer than would fit in memory. With a chunk_size of at least
+          num_points, the walk is the same as fill_walk() makes.
+        """
+        dtype = self.get_dtype()
+        num_points = self.get_num_points()
+        last_x, last_y = 0, 0
+        first_point = 0
+
+        while first_point < num_points:
+            size = min(chunk_size, num_points - first_point)
+            x_values = np.zeros(size, dtype=dtype)
+            y_values = np.zeros(size, dtype=dtype)
+
+            # The first chunk starts at (0, 0); later chunks start one
+            #   step after the end of the previous chunk.
+            start = 1 if first_point == 0 else 0
+            x_steps, y_steps = self.get_steps(size - start)
+            np.cumsum(x_steps, dtype=dtype, out=x_values[start:])
+            np.cumsum(y_steps, dtype=dtype, out=y_values[start:])
+            x_values += last_x
+            y_values += last_y
+
+            yield x_values, y_values
+
+            last_x, last_y = x_values[-1], y_values[-1]
+            first_point += size
+
+    def write_npy(self, path, chunk_size=1_000_000):
+        """Write the walk to a .npy file, and return its WalkStats.
+
+        The file holds an array with shape (2, num_points): row 0 is the
+          x values, and row 1 is the y values. Load it with
+          np.load(path, mmap_mode="r") to use it without reading it all.
+        """
+        points = open_memmap(path, mode="w+", dtype=self.get_dtype(),
+            shape=(2, self.get_num_points()))
+        stats = WalkStats()
+
+        first_point = 0
+        for x_values, y_values in self.iter_chunks(chunk_size):
+            last_point = first_point + len(x_values)
+            points[0, first_point:last_point] = x_values
+            points[1, first_point:last_point] = y_values
+            stats.update(x_values, y_values)
+            first_point = last_point
+
+        points.flush()
+        del points
+        return stats
+
+    def get_stats(self, chunk_size=1_000_000):
+        """Take a walk without keeping any points, and return its WalkStats."""
+        stats = WalkStats()
+        for x_values, y_values in self.iter_chunks(chunk_size):
+            stats.update(x_values, y_values)
+        return stats
+
+    def get_num_points(self):
+        """Number of points the walk has. As in RandomWalk, a walk always
+          has its starting point, even when num_points is 0.
+        """
+        return max(self.num_points, 1)
+
+    def get_dtype(self):
+        """Use int32 unless the walk could go past what int32 can hold.
+        No step is longer than 4 points in either direction.
+        """
+        if 4 * (self.get_num_points() - 1) > np.iinfo(np.int32).max:
+            return np.int64
+        return np.int32
+
+    def get_steps(self, num_steps):
+        """Calculate num_steps steps in the walk, as x and y arrays."""
+        x_steps = self._random_steps(num_steps)
+        y_steps = self._random_steps(num_steps)
+
+        # Reject moves that go nowhere, by redrawing just those steps
+        #   until none are left. About 1 in 25 steps is redrawn each time.
+        stalled = np.flatnonzero((x_steps == 0) & (y_steps == 0))
+        while stalled.size:
+            x_steps[stalled] = self._random_steps(stalled.size)
+            y_steps[stalled] = self._random_steps(stalled.size)
+            still_stalled = (x_steps[stalled] == 0) & (y_steps[stalled] == 0)
+            stalled = stalled[still_stalled]
+
+        return x_steps, y_steps
+
+    def _random_steps(self, num_steps):
+        """Decide which direction to go, and how far to go, for each step."""
+        directions = self.rng.choice(np.array([1, -1], dtype=np.int32),
+            size=num_steps)
+        distances = self.rng.integers(0, 5, size=num_steps, dtype=np.int32)
+        return directions * distances
+
+
+class WalkStats:
+    """Summary statistics for a walk, updated one chunk at a time."""
+
+    def __init__(self):
+        self.num_points = 0
+        self.min_x, self.max_x = 0, 0
+        self.min_y, self.max_y = 0, 0
+        self.final_x, self.final_y = 0, 0
+        self.max_distance = 0.0
+
+    def update(self, x_values, y_values):
+        """Include the next chunk of points in the walk."""
+        self.num_points += len(x_values)
+        self.min_x = min(self.min_x, int(x_values.min()))
+        self.max_x = max(self.max_x, int(x_values.max()))
+        self.min_y = min(self.min_y, int(y_values.min()))
+        self.max_y = max(self.max_y, int(y_values.max()))
+        self.final_x, self.final_y = int(x_values[-1]), int(y_values[-1])
+
+        # Distances from the origin, in float64 so squares can't overflow.
+        squared = (np.square(x_values, dtype=np.float64)
+            + np.square(y_values, dtype=np.float64))
+        self.max_distance = max(self.max_distance,
+            float(np.sqrt(squared.max())))
+
+    @property
+    def final_distance(self):
+        """Straight-line distance from the origin to the last point."""
+        return float(np.hypot(self.final_x, self.final_y))
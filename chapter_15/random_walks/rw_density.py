@@ -0,0 +1,45 @@
+"""Bin the points in a walk into an image, for walks too big to scatter.
+
+Scattering a walk makes one marker per point, so plotting time grows
+  with the length of the walk. Binning the points first makes an image
+  whose size doesn't depend on the walk, so imshow() takes about the
+  same time for any walk.
+"""
+
+import numpy as np
+
+
+def get_density_image(x_values, y_values, bins=800):
+    """Bin the points in a walk, and return an image and its extent.
+
+    Each pixel holds the mean point number of the points in it, so the
+      image keeps the walk's progression when it's colormapped. Pixels
+      the walk never visits are NaN, and are left blank by imshow().
+    """
+    min_x, max_x = int(x_values.min()), int(x_values.max())
+    min_y, max_y = int(y_values.min()), int(y_values.max())
+
+    # Use square pixels, so the walk keeps its shape.
+    pixel_size = max(max_x - min_x + 1, max_y - min_y + 1) / bins
+    num_cols = int((max_x - min_x) / pixel_size) + 1
+    num_rows = int((max_y - min_y) / pixel_size) + 1
+
+    # Find each point's pixel by dividing its offset by the pixel size,
+    #   and truncating, rather than searching bin edges.
+    cols = ((x_values - min_x) / pixel_size).astype(np.intp)
+    rows = ((y_values - min_y) / pixel_size).astype(np.intp)
+    pixels = rows * num_cols + cols
+
+    num_pixels = num_rows * num_cols
+    counts = np.bincount(pixels, minlength=num_pixels)
+    point_numbers = np.arange(len(x_values), dtype=np.float64)
+    totals = np.bincount(pixels, weights=point_numbers, minlength=num_pixels)
+
+    image = np.full(num_pixels, np.nan)
+    visited = counts > 0
+    image[visited] = totals[visited] / counts[visited]
+    image = image.reshape(num_rows, num_cols)
+
+    extent = (min_x, min_x + num_cols * pixel_size,
+        min_y, min_y + num_rows * pixel_size)
+    return image, extent
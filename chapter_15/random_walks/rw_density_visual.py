@@ -0,0 +1,33 @@
+import matplotlib.pyplot as plt
+
+from random_walk_numpy import NumpyRandomWalk
+from rw_density import get_density_image
+
+# Keep making new walks, as long as the program is active.
+while True:
+    # Make a random walk, much longer than rw_visual.py can plot.
+    rw = NumpyRandomWalk(5_000_000)
+    rw.fill_walk()
+
+    # Plot the walk as an image, colored by progression through the walk.
+    plt.style.use('classic')
+    fig, ax = plt.subplots()
+    image, extent = get_density_image(rw.x_values, rw.y_values)
+    ax.imshow(image, cmap=plt.cm.Blues, origin='lower', extent=extent,
+        interpolation='nearest')
+    ax.set_aspect('equal')
+
+    # Emphasize the first and last points.
+    ax.scatter(0, 0, c='green', edgecolors='none', s=100)
+    ax.scatter(rw.x_values[-1], rw.y_values[-1], c='red', edgecolors='none',
+        s=100)
+
+    # Remove the axes.
+    ax.get_xaxis().set_visible(False)
+    ax.get_yaxis().set_visible(False)
+
+    plt.show()
+
+    keep_running = input("Make another walk? (y/n): ")
+    if keep_running == 'n':
+        break
@@ -0,0 +1,96 @@
+"""Make many random walks across a process pool, and summarize them.
+
+Every walk gets its own seed, spawned from one SeedSequence, so the
+  walks are independent, and the results depend only on the seed, not
+  on how many processes are used.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import numpy as np
+
+from random_walk_numpy import NumpyRandomWalk
+
+
+class EnsembleResult:
+    """Summary of an ensemble of walks."""
+
+    def __init__(self, num_walks, msd, end_points):
+        self.num_walks = num_walks
+        # Mean squared displacement from the origin, at each point.
+        self.msd = msd
+        # Last point of each walk, with shape (num_walks, 2).
+        self.end_points = end_points
+
+    def get_end_distances(self):
+        """Distance from the origin to the end of each walk."""
+        return np.hypot(self.end_points[:, 0], self.end_points[:, 1])
+
+    def get_end_histogram(self, bins=50):
+        """2D histogram of where the walks ended."""
+        return np.histogram2d(self.end_points[:, 0], self.end_points[:, 1],
+            bins=bins)
+
+
+def simulate_ensemble(num_walks, num_points=5000, seed=None,
+        num_workers=None):
+    """Make num_walks walks across a process pool, and return an
+      EnsembleResult.
+    """
+    if num_walks < 1:
+        raise ValueError(f"num_walks must be at least 1: {num_walks}")
+    if num_points < 1:
+        raise ValueError(f"num_points must be at least 1: {num_points}")
+    if num_workers is None:
+        num_workers = os.cpu_count()
+    elif num_workers < 1:
+        raise ValueError(f"num_workers must be at least 1: {num_workers}")
+    walk_seeds = np.random.SeedSequence(seed).spawn(num_walks)
+
+    # A few batches per worker keeps all the workers busy, without
+    #   sending each walk to a worker on its own.
+    num_batches = min(num_walks, num_workers * 4)
+    bounds = np.linspace(0, num_walks, num_batches + 1).astype(int)
+    batches = [walk_seeds[start:end]
+        for start, end in zip(bounds[:-1], bounds[1:])]
+
+    squared_total = np.zeros(num_points, dtype=np.float64)
+    end_points = []
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        tasks = executor.map(simulate_batch, batches,
+            [num_points] * num_batches)
+        for batch_squared_total, batch_end_points in tasks:
+            squared_total += batch_squared_total
+            end_points.append(batch_end_points)
+
+    return EnsembleResult(num_walks, squared_total / num_walks,
+        np.concatenate(end_points))
+
+def simulate_batch(walk_seeds, num_points):
+    """Make one walk for each seed.
+
+    Returns the sum of the squared displacements at each point, and the
+      end point of each walk. Walks aren't kept, so memory use doesn't
+      grow with the size of the batch.
+    """
+    squared_total = np.zeros(num_points, dtype=np.float64)
+    end_points = np.zeros((len(walk_seeds), 2), dtype=np.int64)
+
+    for walk_num, walk_seed in enumerate(walk_seeds):
+        rw = NumpyRandomWalk(num_points, seed=walk_seed)
+        rw.fill_walk()
+        squared_total += np.square(rw.x_values, dtype=np.float64)
+        squared_total += np.square(rw.y_values, dtype=np.float64)
+        end_points[walk_num] = rw.x_values[-1], rw.y_values[-1]
+
+    return squared_total, end_points
+
+
+if __name__ == "__main__":
+    result = simulate_ensemble(2_000, 5_000, seed=23)
+    print(f"Made {result.num_walks} walks of {len(result.msd)} points.")
+    for point_num in [10, 100, 1_000, 4_999]:
+        print(f"  MSD at point {point_num}: {result.msd[point_num]:.1f}")
+    distances = result.get_end_distances()
+    print(f"Mean end distance: {distances.mean():.1f}")
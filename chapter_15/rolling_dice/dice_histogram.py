@@ -0,0 +1,40 @@
+import numpy as np
+
+
+class DiceHistogram:
+    """Running counts of dice results, kept as rolls arrive.
+
+    Memory use depends only on the number of possible results, so
+      any number of rolls can be counted without keeping them. Histograms
+      from separate workers can be merged.
+    """
+
+    def __init__(self, poss_results):
+        """poss_results is a range, ie DiceSet.poss_results."""
+        self.poss_results = poss_results
+        self.frequencies = np.zeros(len(poss_results), dtype=np.int64)
+
+    @property
+    def num_rolls(self):
+        return int(self.frequencies.sum())
+
+    def add(self, results):
+        """Count a batch of results, ie from DiceSet.roll()."""
+        results = np.asarray(results)
+        self.frequencies += np.bincount(results - self.poss_results.start,
+            minlength=len(self.poss_results))
+
+    def merge(self, other):
+        """Add the counts from another histogram to this one."""
+        if other.poss_results != self.poss_results:
+            raise ValueError("Can't merge histograms with different"
+                f" possible results: {self.poss_results} and"
+                f" {other.poss_results}.")
+        self.frequencies += other.frequencies
+
+    def update_bar(self, fig):
+        """Show the current counts in a bar chart, ie from px.bar().
+
+        With a go.FigureWidget in a notebook, the chart redraws in place.
+        """
+        fig.data[0].y = self.frequencies
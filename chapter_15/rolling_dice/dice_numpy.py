@@ -0,0 +1,49 @@
+import numpy as np
+
+from dice_histogram import DiceHistogram
+
+
+class DiceSet:
+    """A group of dice, rolled together many times at once with NumPy."""
+
+    def __init__(self, dice, seed=None):
+        """Dice can have any mix of sides, ie [Die(), Die(10)].
+
+        Dice sets made with the same seed make the same rolls.
+        """
+        self.dice = list(dice)
+        self.rng = np.random.default_rng(seed)
+
+        self.min_result = len(self.dice)
+        self.max_result = sum(die.num_sides for die in self.dice)
+        self.poss_results = range(self.min_result, self.max_result+1)
+
+        # Use the smallest type that can hold any result.
+        if self.max_result <= np.iinfo(np.int16).max:
+            self.dtype = np.int16
+        else:
+            self.dtype = np.int64
+
+    def roll(self, num_rolls):
+        """Roll all the dice num_rolls times, and return the totals."""
+        results = np.zeros(num_rolls, dtype=self.dtype)
+        for die in self.dice:
+            results += self.rng.integers(1, die.num_sides+1, size=num_rolls,
+                dtype=self.dtype)
+        return results
+
+    def get_frequencies(self, num_rolls, chunk_size=10_000_000):
+        """Roll the dice num_rolls times, and return the frequency of each
+          possible result, in the order of poss_results.
+
+        Rolls are made chunk_size at a time, so memory use doesn't depend
+          on num_rolls.
+        """
+        histogram = DiceHistogram(self.poss_results)
+        rolls_left = num_rolls
+        while rolls_left > 0:
+            num_chunk_rolls = min(chunk_size, rolls_left)
+            histogram.add(self.roll(num_chunk_rolls))
+            rolls_left -= num_chunk_rolls
+
+        return histogram.frequencies
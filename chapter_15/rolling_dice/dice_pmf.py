@@ -0,0 +1,71 @@
+"""Exact probabilities for the total of a group of dice.
+
+The distribution of a total is the convolution of the distributions of
+  the dice. Here the dice are convolved as integer counts: the number of
+  ways to roll each total. Counts are exact, so the only rounding is the
+  final division by the number of possible rolls.
+
+Counts are int64 while they fit, and Python ints after that. Adding one
+  die is a running sum over a window as wide as the die, so each die
+  costs one pass over the counts, however many sides it has.
+
+Results are cached by the multiset of sides, so [Die(), Die(10)] and
+  [Die(10), Die()] share a result.
+"""
+
+from functools import lru_cache
+import math
+
+import numpy as np
+
+
+def get_pmf(dice):
+    """Return the possible totals of dice, and the probability of each.
+
+    Probabilities are a read-only array, in the order of the totals.
+    """
+    sides = tuple(sorted(die.num_sides for die in dice))
+    probabilities = _get_pmf(sides)
+    poss_results = range(len(sides), len(sides) + len(probabilities))
+    return poss_results, probabilities
+
+def get_expected_frequencies(dice, num_rolls):
+    """Return the expected frequency of each total, over num_rolls rolls."""
+    poss_results, probabilities = get_pmf(dice)
+    return poss_results, probabilities * num_rolls
+
+
+@lru_cache(maxsize=128)
+def _get_pmf(sides):
+    probabilities = convolve_pmf(sides)
+    probabilities.flags.writeable = False
+    return probabilities
+
+def convolve_pmf(sides):
+    """Distribution of the total of dice, from exact counts."""
+    counts = get_counts(sides)
+    num_rolls = math.prod(sides)
+    # Dividing Python ints rounds correctly, even past 2**53.
+    return np.array([int(count) / num_rolls for count in counts])
+
+def get_counts(sides):
+    """Number of ways to roll each total, starting at len(sides)."""
+    # The counts never exceed the number of possible rolls.
+    if math.prod(sides) <= np.iinfo(np.int64).max:
+        dtype = np.int64
+    else:
+        dtype = object
+
+    counts = np.ones(1, dtype=dtype)
+    for num_sides in sides:
+        counts = add_die(counts, num_sides)
+    return counts
+
+def add_die(counts, num_sides):
+    """Counts after adding a die: each new count is the sum of the
+      num_sides old counts that can reach it.
+    """
+    padded = np.concatenate((np.zeros(num_sides, dtype=counts.dtype),
+        counts, np.zeros(num_sides - 1, dtype=counts.dtype)))
+    sums = np.cumsum(padded)
+    return sums[num_sides:] - sums[:-num_sides]
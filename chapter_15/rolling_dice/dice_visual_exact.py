@@ -0,0 +1,29 @@
+import plotly.express as px
+
+from die import Die
+from dice_numpy import DiceSet
+from dice_pmf import get_expected_frequencies
+
+
+# Create three D6s.
+dice = [Die(), Die(), Die()]
+
+# Make some rolls, and count the results.
+num_rolls = 50_000
+dice_set = DiceSet(dice)
+frequencies = dice_set.get_frequencies(num_rolls)
+
+# Calculate the exact expected frequencies, without rolling.
+poss_results, expected = get_expected_frequencies(dice, num_rolls)
+
+# Visualize the results, with the expected frequencies as markers.
+title = "Results of Rolling Three D6 50,000 Times, and Expected Results"
+labels = {'x': 'Result', 'y': 'Frequency of Result'}
+fig = px.bar(x=poss_results, y=frequencies, title=title, labels=labels)
+fig.add_scatter(x=list(poss_results), y=expected, mode='markers',
+    name='Expected')
+
+# Further customize chart.
+fig.update_layout(xaxis_dtick=1)
+
+fig.show()
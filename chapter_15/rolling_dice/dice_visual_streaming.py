@@ -0,0 +1,26 @@
+import plotly.express as px
+
+from die import Die
+from dice_numpy import DiceSet
+from dice_histogram import DiceHistogram
+
+
+# Create a D6 and a D10.
+dice_set = DiceSet([Die(), Die(10)])
+
+# Make an empty chart, to refresh as the rolls come in.
+histogram = DiceHistogram(dice_set.poss_results)
+title = "Results of Rolling a D6 and a D10 10,000,000 Times"
+labels = {'x': 'Result', 'y': 'Frequency of Result'}
+fig = px.bar(x=dice_set.poss_results, y=histogram.frequencies, title=title,
+    labels=labels)
+
+# Roll in batches, counting each batch and then discarding it.
+for batch_num in range(10):
+    histogram.add(dice_set.roll(1_000_000))
+    histogram.update_bar(fig)
+
+# Further customize chart.
+fig.update_layout(xaxis_dtick=1)
+
+fig.show()
@@ -0,0 +1,206 @@
+"""A catalog of earthquakes, stored as columns on disk.
+
+Build a catalog once from any number of GeoJSON feeds; earthquakes that
+  appear in more than one feed are only stored once, and earthquakes
+  with no time or location are left out. Each column is a .npy file,
+  and columns are memory-mapped when the catalog is opened.
+
+Two indexes answer queries without reading every earthquake:
+- Time: rows are sorted by time, so a time window is one slice, found
+  with a binary search. Columns for a time window are views.
+- Space: rows are grouped into grid cells of cell_size degrees. Each
+  cell's rows are one run in cell_order, and cell_starts gives where
+  each run starts, so a bounding box only looks at rows in its cells.
+"""
+
+from pathlib import Path
+import json
+
+import numpy as np
+
+from eq_stream import load_eq_columns
+
+
+COLUMNS = ('time', 'mag', 'lon', 'lat', 'depth', 'title')
+
+class EqCatalog:
+    """Earthquakes in a catalog dir, with time and spatial indexes."""
+
+    def __init__(self, catalog_dir):
+        self.catalog_dir = Path(catalog_dir)
+        info = json.loads((self.catalog_dir / 'catalog_info.json').read_text())
+        self.cell_size = info['cell_size']
+        self.sources = info['sources']
+
+        self.columns = {name: self._load(name) for name in info['columns']}
+        self.cell_order = self._load('cell_order')
+        self.cell_starts = self._load('cell_starts')
+
+    def __len__(self):
+        return len(self.columns['time'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def latest_time(self):
+        """Time of the most recent earthquake, as datetime64[ms]."""
+        return self.columns['time'][-1].astype('datetime64[ms]')
+
+    def query(self, min_mag=None, max_mag=None, start=None, end=None,
+            bbox=None):
+        """Return columns for the earthquakes that match every filter.
+
+        start, end: Time window, as datetime64 values; end is exclusive.
+        bbox: (min_lon, min_lat, max_lon, max_lat), in degrees. A box
+          with min_lon > max_lon crosses the antimeridian.
+        Columns are views when the only filter is a time window.
+        """
+        first, last = self.get_time_range(start, end)
+        if min_mag is None and max_mag is None and bbox is None:
+            return {name: column[first:last]
+                for name, column in self.columns.items()}
+
+        if bbox is None:
+            rows = np.arange(first, last)
+        else:
+            rows = self.get_rows_in_bbox(bbox)
+            rows = rows[(rows >= first) & (rows < last)]
+
+        mags = self.columns['mag'][rows]
+        selected = np.ones(len(rows), dtype=bool)
+        if min_mag is not None:
+            selected &= mags >= min_mag
+        if max_mag is not None:
+            selected &= mags <= max_mag
+        rows = rows[selected]
+
+        return {name: column[rows] for name, column in self.columns.items()}
+
+    def get_time_range(self, start=None, end=None):
+        """Return the first row at or after start, and the first row at
+          or after end.
+        """
+        times = self.columns['time']
+        first, last = 0, len(times)
+        if start is not None:
+            first = np.searchsorted(times, to_ms(start), side='left')
+        if end is not None:
+            last = np.searchsorted(times, to_ms(end), side='left')
+        return first, max(first, last)
+
+    def get_rows_in_bbox(self, bbox):
+        """Return the rows in bbox, in time order.
+
+        A box with min_lon > max_lon crosses the antimeridian, and is
+          split into two boxes, one on each side of it.
+        """
+        min_lon, min_lat, max_lon, max_lat = bbox
+        if min_lat > max_lat:
+            raise ValueError(f"min_lat is greater than max_lat: {bbox}")
+        if min_lon > max_lon:
+            return np.union1d(
+                self.get_rows_in_bbox((min_lon, min_lat, 180, max_lat)),
+                self.get_rows_in_bbox((-180, min_lat, max_lon, max_lat)))
+
+        num_rows, num_cols = get_grid_shape(self.cell_size)
+
+        # Every cell that overlaps the box.
+        first_row, first_col = get_cell(min_lat, min_lon, self.cell_size)
+        last_row, last_col = get_cell(max_lat, max_lon, self.cell_size)
+        cells = (np.arange(first_row, last_row+1)[:, np.newaxis] * num_cols
+            + np.arange(first_col, last_col+1)).ravel()
+
+        # Gather each cell's run of rows from cell_order, without a loop.
+        run_starts = self.cell_starts[cells]
+        run_lengths = self.cell_starts[cells + 1] - run_starts
+        run_offsets = np.cumsum(run_lengths) - run_lengths
+        positions = (np.repeat(run_starts - run_offsets, run_lengths)
+            + np.arange(run_lengths.sum()))
+        rows = np.sort(self.cell_order[positions])
+
+        # Cells on the edge of the box can hold rows outside it.
+        lons, lats = self.columns['lon'][rows], self.columns['lat'][rows]
+        in_bbox = ((lons >= min_lon) & (lons <= max_lon)
+            & (lats >= min_lat) & (lats <= max_lat))
+        return rows[in_bbox]
+
+    def _load(self, name):
+        return np.load(self.catalog_dir / f"{name}.npy", mmap_mode='r')
+
+
+def build_catalog(catalog_dir, geojson_paths, cell_size=1.0):
+    """Build a catalog from GeoJSON feeds, and return it as an EqCatalog."""
+    catalog_dir = Path(catalog_dir)
+    catalog_dir.mkdir(parents=True, exist_ok=True)
+
+    all_columns = [load_feed(path) for path in geojson_paths]
+    columns = {name: np.concatenate([c[name] for c in all_columns])
+        for name in ('id',) + COLUMNS}
+
+    # Keep one row per earthquake, and sort rows by time.
+    _, unique_rows = np.unique(columns['id'], return_index=True)
+    rows = unique_rows[np.argsort(columns['time'][unique_rows],
+        kind='stable')]
+    for name in COLUMNS:
+        np.save(catalog_dir / f"{name}.npy", columns[name][rows])
+
+    # Group rows by cell. A stable sort keeps each cell in time order.
+    num_rows, num_cols = get_grid_shape(cell_size)
+    cell_rows, cell_cols = get_cell(columns['lat'][rows],
+        columns['lon'][rows], cell_size)
+    cells = cell_rows * num_cols + cell_cols
+    cell_order = np.argsort(cells, kind='stable')
+    cell_counts = np.bincount(cells, minlength=num_rows * num_cols)
+    cell_starts = np.concatenate(([0], np.cumsum(cell_counts)))
+    np.save(catalog_dir / 'cell_order.npy', cell_order)
+    np.save(catalog_dir / 'cell_starts.npy', cell_starts)
+
+    info = {
+        'columns': list(COLUMNS),
+        'cell_size': cell_size,
+        'sources': [Path(path).name for path in geojson_paths],
+    }
+    (catalog_dir / 'catalog_info.json').write_text(json.dumps(info))
+    return EqCatalog(catalog_dir)
+
+def load_feed(path):
+    """Load the columns of a feed, for the earthquakes that can be indexed.
+    Earthquakes without a time or a location are left out.
+    """
+    columns = load_eq_columns(path, ('id',) + COLUMNS)
+    keep = ~(np.ma.getmaskarray(columns['time'])
+        | np.isnan(columns['lon']) | np.isnan(columns['lat']))
+    return {name: np.ma.getdata(column)[keep]
+        for name, column in columns.items()}
+
+def get_grid_shape(cell_size):
+    """Number of rows and columns of cells covering the world."""
+    return int(np.ceil(180 / cell_size)), int(np.ceil(360 / cell_size))
+
+def get_cell(lat, lon, cell_size):
+    """Row and column of the cell holding a point, or array of points."""
+    num_rows, num_cols = get_grid_shape(cell_size)
+    row = np.clip(np.floor_divide(np.add(lat, 90), cell_size).astype(int),
+        0, num_rows-1)
+    col = np.clip(np.floor_divide(np.add(lon, 180), cell_size).astype(int),
+        0, num_cols-1)
+    return row, col
+
+def to_ms(time):
+    """Convert a datetime64 value, or a date string, to ms since 1970."""
+    return np.datetime64(time, 'ms').astype(np.int64)
+
+
+if __name__ == '__main__':
+    paths = sorted(Path('eq_data').glob('eq_data_*.geojson'))
+    catalog = build_catalog('eq_data/.eq_catalog', paths)
+    print(f"Built a catalog of {len(catalog)} earthquakes from"
+        f" {len(paths)} feeds.")
+
+    # All M4.5+ earthquakes in the western Pacific in the last week.
+    last_week = catalog.latest_time - np.timedelta64(7, 'D')
+    quakes = catalog.query(min_mag=4.5, start=last_week,
+        bbox=(120, -50, 180, 60))
+    for mag, title in zip(quakes['mag'], quakes['title']):
+        print(f"  {mag:.1f}  {title}")
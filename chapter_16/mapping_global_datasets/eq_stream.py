@@ -0,0 +1,171 @@
+"""Read earthquake data from a GeoJSON feed, one feature at a time.
+
+json.loads() builds the whole document before anything can be used,
+  so a large archive needs several times its size in memory. This reader
+  reads the file in blocks, and decodes one feature at a time with
+  JSONDecoder.raw_decode(). Only the current block and feature are kept.
+
+load_eq_columns() copies the fields it's asked for into preallocated
+  NumPy arrays, sized from the feed's metadata count when it has one.
+"""
+
+import json, re
+
+import numpy as np
+
+
+# Fields that can be loaded: name: (path in each feature, dtype).
+FIELDS = {
+    'id': (('id',), str),
+    'mag': (('properties', 'mag'), np.float64),
+    'lon': (('geometry', 'coordinates', 0), np.float64),
+    'lat': (('geometry', 'coordinates', 1), np.float64),
+    'depth': (('geometry', 'coordinates', 2), np.float64),
+    'time': (('properties', 'time'), np.int64),
+    'title': (('properties', 'title'), str),
+    'place': (('properties', 'place'), str),
+}
+
+# What a missing value is stored as, for each dtype. Missing integers
+#   are also masked.
+MISSING_VALUES = {np.float64: np.nan, np.int64: 0, str: ''}
+
+METADATA_RE = re.compile(r'"metadata"\s*:\s*')
+FEATURES_RE = re.compile(r'"features"\s*:\s*\[')
+WHITESPACE_RE = re.compile(r'[\s,]*')
+
+class GeoJSONStream:
+    """Features in a GeoJSON file, decoded one at a time."""
+
+    def __init__(self, path, block_size=2**16):
+        self.path = path
+        self.block_size = block_size
+        self.metadata = {}
+        self._decoder = json.JSONDecoder()
+        self._file = None
+        self._buffer = ''
+        self._pos = 0
+
+    def __enter__(self):
+        self._file = open(self.path, encoding='utf-8')
+        self._read_header()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._file.close()
+
+    def __iter__(self):
+        """Yield each feature as a dict."""
+        while True:
+            self._pos = WHITESPACE_RE.match(self._buffer, self._pos).end()
+            if self._pos == len(self._buffer):
+                if not self._read_block():
+                    raise ValueError(f"{self.path} ended inside features.")
+                continue
+
+            if self._buffer[self._pos] == ']':
+                return
+
+            try:
+                feature, end = self._decoder.raw_decode(self._buffer,
+                    self._pos)
+            except json.JSONDecodeError:
+                # The feature continues in the next block.
+                if not self._read_block():
+                    raise
+                continue
+
+            self._pos = end
+            yield feature
+
+    def _read_header(self):
+        """Read up to the start of the features array, and decode the
+          metadata if it comes first, as it does in USGS feeds.
+        """
+        while not (match := FEATURES_RE.search(self._buffer)):
+            if not self._read_block():
+                raise ValueError(f"{self.path} has no features array.")
+
+        metadata_match = METADATA_RE.search(self._buffer, 0, match.start())
+        if metadata_match:
+            self.metadata, _ = self._decoder.raw_decode(self._buffer,
+                metadata_match.end())
+
+        self._pos = match.end()
+
+    def _read_block(self):
+        """Add a block to the buffer, dropping what's been decoded.
+        Returns False at the end of the file.
+        """
+        block = self._file.read(self.block_size)
+        if not block:
+            return False
+        self._buffer = self._buffer[self._pos:] + block
+        self._pos = 0
+        return True
+
+
+def load_eq_columns(path, fields=('mag', 'lon', 'lat', 'title'),
+        block_size=2**16):
+    """Return a dict of arrays, one for each field in FIELDS.
+
+    A value is missing when its field is null or absent, as with a null
+      geometry. Missing values are NaN in float fields, and empty in
+      string fields. Integer fields, such as time, are masked arrays, with
+      missing values masked. Arrays are preallocated from the metadata
+      count, or grown by doubling if there isn't one.
+    """
+    paths = {name: FIELDS[name][0] for name in fields}
+    with GeoJSONStream(path, block_size) as stream:
+        size = stream.metadata.get('count') or 1024
+        columns = {name: make_column(name, size) for name in fields}
+        masks = {name: np.zeros(size, dtype=bool) for name in fields
+            if FIELDS[name][1] is np.int64}
+
+        num_features = 0
+        for feature in stream:
+            if num_features == size:
+                size *= 2
+                for name, column in columns.items():
+                    columns[name] = np.resize(column, size)
+                for name, mask in masks.items():
+                    masks[name] = np.resize(mask, size)
+
+            for name, field_path in paths.items():
+                value = get_value(feature, field_path)
+                if name in masks:
+                    masks[name][num_features] = value is None
+                if value is None:
+                    value = MISSING_VALUES[FIELDS[name][1]]
+                columns[name][num_features] = value
+            num_features += 1
+
+    # Strings are collected as objects, then stored with a fixed width.
+    for name, column in columns.items():
+        column = column[:num_features]
+        if FIELDS[name][1] is str:
+            column = column.astype(str)
+        elif name in masks:
+            column = np.ma.masked_array(column,
+                mask=masks[name][:num_features])
+        columns[name] = column
+
+    return columns
+
+def make_column(name, size):
+    dtype = FIELDS[name][1]
+    if dtype is str:
+        return np.empty(size, dtype=object)
+    return np.empty(size, dtype=dtype)
+
+def get_value(feature, field_path):
+    """Value at field_path in feature, or None if any part is missing."""
+    value = feature
+    for key in field_path:
+        if value is None:
+            return None
+        try:
+            value = value[key]
+        except (KeyError, IndexError):
+            return None
+    return value
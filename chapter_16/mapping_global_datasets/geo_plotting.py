@@ -0,0 +1,97 @@
+"""Plot points on a world map, with a backend that suits the number
+  of points.
+
+- Up to SVG_MAX_POINTS, use scatter_geo(), as the book's programs do.
+  Every point is an SVG element, which gets sluggish past about 10k points.
+- Up to WEBGL_MAX_POINTS, use scatter_mapbox(), which draws with WebGL.
+  Every point is still plotted, and the map stays responsive.
+- Beyond that, aggregate points into grid cells before plotting, so the
+  HTML file only holds one marker per occupied cell.
+"""
+
+import numpy as np
+import plotly.express as px
+
+
+SVG_MAX_POINTS = 10_000
+WEBGL_MAX_POINTS = 200_000
+
+def choose_backend(num_points):
+    """Return "svg", "webgl", or "grid" for num_points points."""
+    if num_points <= SVG_MAX_POINTS:
+        return "svg"
+    if num_points <= WEBGL_MAX_POINTS:
+        return "webgl"
+    return "grid"
+
+def plot_points(lats, lons, values, title, label, color_scale='Viridis',
+        hover_names=None, backend=None, cell_size=0.5):
+    """Plot values at points on a world map, and return the figure.
+
+    Points are colored by value. With the svg backend they're also sized
+      by value; with more points, sizing every marker adds little but
+      makes the HTML much bigger.
+    backend: "svg", "webgl", or "grid"; chosen by number of points if None.
+    cell_size: Size of grid cells for the grid backend, in degrees.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    backend = backend or choose_backend(len(lats))
+
+    if backend == "svg":
+        return px.scatter_geo(lat=lats, lon=lons, size=values, title=title,
+            color=values,
+            color_continuous_scale=color_scale,
+            labels={'color': label},
+            projection='natural earth',
+            hover_name=hover_names,
+        )
+
+    if backend == "webgl":
+        fig = px.scatter_mapbox(lat=lats, lon=lons, title=title,
+            color=values,
+            color_continuous_scale=color_scale,
+            labels={'color': label},
+            hover_name=hover_names,
+            mapbox_style='carto-positron',
+            zoom=0,
+        )
+        fig.update_traces(marker_size=4)
+        return fig
+
+    if backend == "grid":
+        cell_lats, cell_lons, counts, means = aggregate_grid(lats, lons,
+            values, cell_size)
+        return px.scatter_mapbox(lat=cell_lats, lon=cell_lons,
+            title=f"{title} ({len(lats):,} points, by {cell_size}° cell)",
+            size=counts,
+            color=means,
+            color_continuous_scale=color_scale,
+            labels={'color': f"Mean {label.lower()}", 'size': 'Points'},
+            mapbox_style='carto-positron',
+            zoom=0,
+        )
+
+    raise ValueError(f"Unknown backend: {backend}")
+
+def aggregate_grid(lats, lons, values, cell_size=0.5):
+    """Group points into cells of cell_size degrees.
+
+    Returns the center of each occupied cell, the number of points in it,
+      and the mean of their values.
+    """
+    num_rows = int(np.ceil(180 / cell_size))
+    num_cols = int(np.ceil(360 / cell_size))
+    rows = np.clip(((lats + 90) // cell_size).astype(np.intp), 0, num_rows-1)
+    cols = np.clip(((lons + 180) // cell_size).astype(np.intp), 0, num_cols-1)
+
+    # Number the occupied cells, and find each point's cell.
+    cells, point_cells = np.unique(rows * num_cols + cols,
+        return_inverse=True)
+    counts = np.bincount(point_cells)
+    means = np.bincount(point_cells, weights=values) / counts
+
+    cell_lats = (cells // num_cols + 0.5) * cell_size - 90
+    cell_lons = (cells % num_cols + 0.5) * cell_size - 180
+    return cell_lats, cell_lons, counts, means
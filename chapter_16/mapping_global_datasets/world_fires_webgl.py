@@ -0,0 +1,19 @@
+from pathlib import Path
+
+import numpy as np
+
+from geo_plotting import plot_points
+
+
+# Read latitudes, longitudes, and brightnesses from all 41k rows.
+path = Path('eq_data/world_fires_7_day.csv')
+lats, lons, brights = np.loadtxt(path, delimiter=',', skiprows=1,
+    usecols=(0, 1, 2), unpack=True)
+
+# Plot brightnesses on a world map. With this many points, the map is
+#   drawn with WebGL.
+title = "Global wildfire activity, 7 days"
+fig = plot_points(lats, lons, brights, title, 'Brightness',
+    color_scale='YlOrRd')
+
+fig.show()
@@ -0,0 +1,28 @@
+import matplotlib.pyplot as plt
+
+from weather_loader import load_weather_data
+
+
+# Load the data, and summarize any gaps in it.
+data = load_weather_data('weather_data/death_valley_2021_simple.csv',
+    ['TMAX', 'TMIN'])
+print(data.summarize_missing(['TMAX', 'TMIN']))
+
+# Break the lines at missing values, instead of joining across them.
+dates, (highs, lows) = data.get_plot_values(['TMAX', 'TMIN'], gaps='break')
+
+# Plot the high and low temperatures.
+plt.style.use('seaborn-v0_8')
+fig, ax = plt.subplots()
+ax.plot(dates, highs, color='red', alpha=0.5)
+ax.plot(dates, lows, color='blue', alpha=0.5)
+ax.fill_between(dates, highs, lows, facecolor='blue', alpha=0.1)
+
+# Format plot.
+title = f"Daily High and Low Temperatures, 2021\n{data.place_name}"
+ax.set_title(title, fontsize=20)
+fig.autofmt_xdate()
+ax.set_ylabel("Temperature (F)", fontsize=16)
+ax.tick_params(labelsize=16)
+
+plt.show()
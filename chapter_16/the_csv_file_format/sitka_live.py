@@ -0,0 +1,29 @@
+from pathlib import Path
+
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+
+from weather_live import WeatherFollower, LiveWeatherPlot
+
+
+# Follow the data file; new daily rows are read as they're added.
+path = Path('weather_data/sitka_weather_2021_simple.csv')
+follower = WeatherFollower(path)
+
+# Plot the high and low temperatures.
+plt.style.use('seaborn-v0_8')
+fig, ax = plt.subplots()
+live_plot = LiveWeatherPlot(ax, follower)
+
+# Format plot.
+title = f"Daily High and Low Temperatures\n{follower.weather_data.place_name}"
+ax.set_title(title, fontsize=20)
+fig.autofmt_xdate()
+ax.set_ylabel("Temperature (F)", fontsize=16)
+ax.tick_params(labelsize=16)
+
+# Check for new rows once a minute.
+animation = FuncAnimation(fig, live_plot.update, interval=60_000,
+    cache_frame_data=False)
+
+plt.show()
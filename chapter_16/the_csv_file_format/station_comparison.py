@@ -0,0 +1,25 @@
+import matplotlib.pyplot as plt
+
+from weather_stations import load_station_table
+
+
+# The files are loaded in worker processes, which import this program
+#   when they start on macOS and Windows. The guard keeps each worker
+#   from starting a pool of its own.
+if __name__ == '__main__':
+    # Load the daily highs for every station with a full data file.
+    table = load_station_table('weather_data', column='TMAX')
+
+    # Plot weekly rolling means of the highs, for all stations at once.
+    plt.style.use('seaborn-v0_8')
+    fig, ax = plt.subplots()
+    table.plot(ax, window=7, alpha=0.8)
+
+    # Format plot.
+    title = "Daily high temperatures, 7-day rolling mean"
+    ax.set_title(title, fontsize=20)
+    fig.autofmt_xdate()
+    ax.set_ylabel("Temperature (F)", fontsize=16)
+    ax.tick_params(labelsize=16)
+
+    plt.show()
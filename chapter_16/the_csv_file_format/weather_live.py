@@ -0,0 +1,156 @@
+"""Follow a weather data file as new rows are added, and keep a plot
+  up to date.
+
+WeatherFollower remembers how far into the file it has read, by byte
+  offset, and the last date it has seen. Each read only parses the
+  complete rows added since the last read.
+
+LiveWeatherPlot updates its lines and its fill_between() area in place,
+  instead of clearing the axes and plotting everything again.
+"""
+
+from pathlib import Path
+import csv, io
+
+import matplotlib.dates as mdates
+import numpy as np
+
+from weather_loader import WeatherData, read_weather_rows
+
+
+class WeatherFollower:
+    """Read the rows added to a weather data file since the last read."""
+
+    def __init__(self, path, columns=('TMAX', 'TMIN')):
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.reset()
+
+    def reset(self):
+        """Forget what's been read, so the next read starts over."""
+        self.offset = 0
+        self.header_row = None
+        self.last_date = None
+        self.weather_data = None
+
+    def read_new_rows(self):
+        """Parse any complete rows added since the last read.
+
+        Returns a WeatherData object with just the new rows, or None if
+          there aren't any. All rows read so far are in self.weather_data.
+        """
+        if self.path.stat().st_size < self.offset:
+            # The file was replaced by a shorter one; start over.
+            self.reset()
+
+        with self.path.open('rb') as f:
+            f.seek(self.offset)
+            new_bytes = f.read()
+
+        # Leave a partly written last row for the next read.
+        end = new_bytes.rfind(b'\n') + 1
+        if not end:
+            return None
+        self.offset += end
+        new_rows = io.StringIO(new_bytes[:end].decode('utf-8'), newline='')
+
+        if self.header_row is None:
+            self.header_row = next(csv.reader([new_rows.readline()]))
+        new_data = read_weather_rows(new_rows, self.header_row, self.columns,
+            self.path)
+
+        # Skip rows that repeat dates already read, ie a republished day.
+        if self.last_date is not None:
+            new_data = select_rows(new_data, new_data.dates > self.last_date)
+        if not len(new_data):
+            return None
+
+        self.last_date = new_data.dates.max()
+        if self.weather_data is None:
+            self.weather_data = new_data
+        else:
+            self.weather_data = concatenate(self.weather_data, new_data)
+        return new_data
+
+
+class LiveWeatherPlot:
+    """Plot highs and lows, and update the plot as rows are added."""
+
+    def __init__(self, ax, follower, high_name='TMAX', low_name='TMIN'):
+        self.ax = ax
+        self.follower = follower
+        self.high_name = high_name
+        self.low_name = low_name
+
+        self.follower.read_new_rows()
+        dates, highs, lows = self._get_values()
+        self.high_line, = ax.plot(dates, highs, color='red', alpha=0.5)
+        self.low_line, = ax.plot(dates, lows, color='blue', alpha=0.5)
+        self.fill = ax.fill_between(dates, highs, lows, facecolor='blue',
+            alpha=0.1)
+
+    def update(self, frame_num=None):
+        """Read new rows, and update the plot if there are any.
+        Returns the artists that changed, so it works with FuncAnimation.
+        """
+        if self.follower.read_new_rows() is None:
+            return []
+
+        dates, highs, lows = self._get_values()
+        self.high_line.set_data(dates, highs)
+        self.low_line.set_data(dates, lows)
+        self.fill.set_verts(get_fill_verts(mdates.date2num(dates), highs,
+            lows))
+
+        self.ax.relim()
+        self.ax.autoscale_view()
+        return [self.high_line, self.low_line, self.fill]
+
+    def _get_values(self):
+        weather_data = self.follower.weather_data
+        if weather_data is None:
+            return np.array([], dtype='datetime64[D]'), [], []
+
+        dates, (highs, lows) = weather_data.get_plot_values(
+            [self.high_name, self.low_name])
+        return dates, highs, lows
+
+
+def get_fill_verts(x, y1, y2):
+    """Return polygons for the area between y1 and y2, as fill_between()
+      makes them. There's one polygon for each run of points where both
+      y values are present, so the area breaks at gaps.
+    """
+    valid = ~(np.isnan(y1) | np.isnan(y2))
+    edges = np.diff(np.concatenate(([0], valid.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    verts = []
+    for start, end in zip(starts, ends):
+        # Along y1, then back along y2, closing at the first point.
+        xs = np.concatenate((x[start:end], x[start:end][::-1],
+            x[start:start+1]))
+        ys = np.concatenate((y1[start:end], y2[start:end][::-1],
+            y1[start:start+1]))
+        verts.append(np.column_stack((xs, ys)))
+    return verts
+
+def select_rows(weather_data, selected):
+    """Return a WeatherData object with just the selected rows."""
+    columns = {name: values[selected]
+        for name, values in weather_data.columns.items()}
+    return WeatherData(weather_data.dates[selected], columns,
+        weather_data.path)
+
+def concatenate(weather_data, new_data):
+    """Return a WeatherData object with the rows of both objects."""
+    columns = {}
+    for name, values in weather_data.columns.items():
+        if isinstance(values, np.ma.MaskedArray):
+            columns[name] = np.ma.concatenate((values, new_data[name]))
+        else:
+            columns[name] = np.concatenate((values, new_data[name]))
+
+    dates = np.concatenate((weather_data.dates, new_data.dates))
+    return WeatherData(dates, columns, weather_data.path)
@@ -0,0 +1,313 @@
+"""Load NOAA weather data into NumPy columns.
+
+The weather programs read a file row by row, and call strptime() for
+  every date. This loader parses the file in bulk with pandas' C parser,
+  reading only the columns it's asked for. Dates become a datetime64
+  array, and measurements become masked arrays, with missing values
+  masked.
+
+Columns are found by name, as in automatic_indexes.py, so the same code
+  works for the simple and full exports.
+
+With cache=True, parsed columns are saved as .npy files in a
+  .weather_cache/ dir next to the data file. Later loads memory-map
+  those files instead of parsing the text again. The cache is rebuilt
+  when the data file's contents change; it's checked by size and mtime
+  first, and by hash only if those have changed.
+"""
+
+from pathlib import Path
+import csv, hashlib, json, os
+
+import numpy as np
+import pandas as pd
+
+
+# Columns that hold text, rather than measurements. Flag columns such as
+#   PRCP_ATTRIBUTES are text too, and so is any column that isn't numeric.
+TEXT_COLUMNS = {'STATION', 'NAME'}
+ATTRIBUTES_SUFFIX = '_ATTRIBUTES'
+
+class WeatherData:
+    """Columns from one weather data file."""
+
+    def __init__(self, dates, columns, path=None):
+        # datetime64[D] array.
+        self.dates = dates
+        # Column name: masked array, or array of strings.
+        self.columns = columns
+        self.path = path
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def place_name(self):
+        """Name of the first station in the file."""
+        names = self.columns.get('NAME')
+        if names is None or not len(names):
+            return ""
+        return str(names[0])
+
+    def get_missing_mask(self, names):
+        """True for each row that's missing a value in any named column."""
+        missing = np.zeros(len(self), dtype=bool)
+        for name in names:
+            missing |= np.ma.getmaskarray(self[name])
+        return missing
+
+    def get_gaps(self, names):
+        """Return runs of rows with missing data, as tuples of
+          (first date, last date, number of rows).
+        """
+        missing = self.get_missing_mask(names).astype(np.int8)
+        # Gaps start where the mask goes from 0 to 1, and end where it
+        #   goes from 1 to 0.
+        edges = np.diff(np.concatenate(([0], missing, [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        return [(self.dates[start], self.dates[end-1], int(end - start))
+            for start, end in zip(starts, ends)]
+
+    def summarize_missing(self, names):
+        """Describe the gaps in the named columns, in one line."""
+        columns = ' or '.join(names)
+        gaps = self.get_gaps(names)
+        if not gaps:
+            return f"No missing {columns} data."
+
+        num_rows = sum(gap[2] for gap in gaps)
+        gap_dates = [str(first) if first == last else f"{first} to {last}"
+            for first, last, _ in gaps]
+        days = "day" if num_rows == 1 else "days"
+        gaps_text = "gap" if len(gaps) == 1 else "gaps"
+        return (f"Missing {columns} data for {num_rows} {days},"
+            f" in {len(gaps)} {gaps_text}: {', '.join(gap_dates)}")
+
+    def report_missing(self, names):
+        """Return one line for each row with missing data, as the book's
+          programs print it, ie "Missing data for 2021-05-04 00:00:00".
+        """
+        missing_dates = self.dates[self.get_missing_mask(names)]
+        # datetime objects print with a time, as they do after strptime().
+        return [f"Missing data for {date}" for date in
+            missing_dates.astype('datetime64[s]').astype(object)]
+
+    def get_plot_values(self, names, gaps='break'):
+        """Return dates, and a list of values for each named column, for
+          plotting, ie dates, (highs, lows) = get_plot_values(['TMAX', 'TMIN']).
+
+        gaps: How to plot missing values.
+          'break': Missing values are NaN, so lines stop at each gap.
+          'interpolate': Fill missing values linearly from their neighbors.
+          'drop': Leave out rows with a missing value in any named column,
+            as the book's programs do, so all columns share the same dates.
+        """
+        columns = [self[name] for name in names]
+
+        if gaps == 'break':
+            return self.dates, [values.filled(np.nan) for values in columns]
+        if gaps == 'interpolate':
+            day_nums = self.dates.astype(np.int64)
+            return self.dates, [np.interp(day_nums,
+                day_nums[~np.ma.getmaskarray(values)], values.compressed())
+                for values in columns]
+        if gaps == 'drop':
+            present = ~self.get_missing_mask(names)
+            return self.dates[present], [values.filled(np.nan)[present]
+                for values in columns]
+
+        raise ValueError(f"Unknown gaps option: {gaps}")
+
+
+def load_weather_data(path, columns=None, cache=False):
+    """Load a weather data file, and return a WeatherData object.
+
+    columns: Names of the columns to load, ie ['TMAX', 'TMIN']. DATE is
+      always loaded, and NAME is loaded if it's in the file. If None,
+      every column is loaded.
+    cache: Load columns from the binary cache, building it if needed.
+    """
+    path = Path(path)
+    if cache:
+        return load_cached_weather_data(path, columns)
+
+    with path.open(newline='', encoding='utf-8') as f:
+        header_row = next(csv.reader([f.readline()]))
+        return read_weather_rows(f, header_row, columns, path)
+
+def read_weather_rows(f, header_row, columns=None, path=None):
+    """Parse the rows left in f, a file or text stream, and return a
+      WeatherData object. f should be past the header row.
+    See load_weather_data() for columns.
+    """
+    columns = get_column_names(header_row, columns, path)
+
+    # Known text columns are read as strings; only empty fields count as
+    #   missing measurements.
+    text_columns = {name: str for name in header_row
+        if name == 'DATE' or is_text_column(name)}
+    frame = pd.read_csv(f, header=None, names=header_row,
+        usecols=['DATE'] + columns, dtype=text_columns,
+        keep_default_na=False, na_values=[''])
+
+    dates = frame['DATE'].to_numpy().astype('datetime64[D]')
+    data = {}
+    for name in columns:
+        column = frame[name]
+        if name in text_columns or not pd.api.types.is_numeric_dtype(column):
+            # Plain strings, with no mask.
+            data[name] = column.fillna('').astype(str).to_numpy(dtype=str)
+        else:
+            values = column.to_numpy(dtype=np.float64)
+            data[name] = np.ma.masked_invalid(values, copy=False)
+
+    return WeatherData(dates, data, path)
+
+def is_text_column(name):
+    return name in TEXT_COLUMNS or name.endswith(ATTRIBUTES_SUFFIX)
+
+def get_column_names(header_row, columns=None, path=None):
+    """Return the columns to load, checking that they're all in the file.
+    See load_weather_data() for columns.
+    """
+    file_name = path.name if path else "Weather data"
+    if columns is None:
+        columns = [name for name in header_row if name != 'DATE']
+    else:
+        columns = list(columns)
+        if 'NAME' in header_row and 'NAME' not in columns:
+            columns.append('NAME')
+
+    missing_columns = [name for name in ['DATE'] + columns
+        if name not in header_row]
+    if missing_columns:
+        raise ValueError(f"{file_name} has no column {missing_columns[0]};"
+            f" columns are: {', '.join(header_row)}")
+
+    return columns
+
+
+# --- Binary cache ---
+
+CACHE_DIR_NAME = '.weather_cache'
+CACHE_VERSION = 2
+
+def load_cached_weather_data(path, columns=None):
+    """Load columns from the cache for path, building the cache if it's
+      missing or out of date. Columns are memory-mapped, read-only.
+    """
+    path = Path(path)
+    cache_dir = get_cache_dir(path)
+    cache_info = read_cache_info(path, cache_dir)
+    if cache_info is None:
+        cache_info = write_cache(path, cache_dir)
+
+    if columns is None:
+        columns = cache_info['columns']
+    else:
+        columns = list(columns)
+        if 'NAME' in cache_info['columns'] and 'NAME' not in columns:
+            columns.append('NAME')
+
+    for name in columns:
+        if name not in cache_info['columns']:
+            raise ValueError(f"{path.name} has no column {name}; columns"
+                f" are: {', '.join(['DATE'] + cache_info['columns'])}")
+
+    dates = load_npy(cache_dir, 'DATE')
+    data = {}
+    for name in columns:
+        values = load_npy(cache_dir, name)
+        if name in cache_info['text_columns']:
+            data[name] = values
+        else:
+            mask = load_npy(cache_dir, f"{name}.mask")
+            data[name] = np.ma.masked_array(values, mask=mask, copy=False)
+
+    return WeatherData(dates, data, path)
+
+def get_cache_dir(path):
+    return path.parent / CACHE_DIR_NAME / path.name
+
+def read_cache_info(path, cache_dir):
+    """Return the cache's info if it matches path, or None."""
+    info_path = cache_dir / 'cache_info.json'
+    try:
+        cache_info = json.loads(info_path.read_text())
+    except (OSError, ValueError):
+        return None
+
+    if cache_info.get('version') != CACHE_VERSION:
+        return None
+
+    # An unchanged size and mtime is taken to mean an unchanged file.
+    stat = path.stat()
+    if (cache_info['size'], cache_info['mtime_ns']) == (stat.st_size,
+            stat.st_mtime_ns):
+        return cache_info
+
+    # The file was touched, or copied; only rebuild if it's different.
+    if cache_info['sha256'] != hash_file(path):
+        return None
+
+    cache_info['size'], cache_info['mtime_ns'] = (stat.st_size,
+        stat.st_mtime_ns)
+    write_atomic(info_path, json.dumps(cache_info).encode('utf-8'))
+    return cache_info
+
+def write_cache(path, cache_dir):
+    """Parse all the columns in path, and save them in cache_dir.
+    Measurements are saved as float arrays with a separate mask, and text
+      columns, ie PRCP_ATTRIBUTES, as string arrays.
+    """
+    # Check the file before parsing it, so a change while it's being
+    #   parsed leaves a cache that doesn't match.
+    stat = path.stat()
+    sha256 = hash_file(path)
+    weather_data = load_weather_data(path)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    save_npy(cache_dir, 'DATE', weather_data.dates)
+    text_columns = []
+    for name, values in weather_data.columns.items():
+        if not isinstance(values, np.ma.MaskedArray):
+            save_npy(cache_dir, name, values)
+            text_columns.append(name)
+        else:
+            save_npy(cache_dir, name, values.data)
+            save_npy(cache_dir, f"{name}.mask", np.ma.getmaskarray(values))
+
+    # Write the info last, so a partly written cache is never used.
+    cache_info = {
+        'version': CACHE_VERSION,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256,
+        'columns': list(weather_data.columns),
+        'text_columns': text_columns,
+    }
+    write_atomic(cache_dir / 'cache_info.json',
+        json.dumps(cache_info).encode('utf-8'))
+    return cache_info
+
+def hash_file(path):
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+def load_npy(cache_dir, name):
+    return np.load(cache_dir / f"{name}.npy", mmap_mode='r')
+
+def save_npy(cache_dir, name, array):
+    """Save an array, without ever leaving a partly written file."""
+    tmp_path = cache_dir / f"{name}.npy.{os.getpid()}.tmp"
+    with tmp_path.open('wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, cache_dir / f"{name}.npy")
+
+def write_atomic(path, contents):
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(contents)
+    os.replace(tmp_path, path)
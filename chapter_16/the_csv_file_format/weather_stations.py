@@ -0,0 +1,159 @@
+"""Load many weather stations into one table, and compare them.
+
+Files are loaded in parallel across processes, with weather_loader.
+Each station becomes one row of a station x date table, with one column
+  for every day from the first date in any file to the last. Days a
+  station has no data for are masked.
+
+Rolling and seasonal aggregates work on the whole table at once, with
+  no loop over stations.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from weather_loader import load_weather_data
+
+
+# Meteorological seasons, by month number - 1.
+SEASONS = ['Winter', 'Spring', 'Summer', 'Fall']
+MONTH_SEASONS = np.array([0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+
+class StationTable:
+    """One measurement, ie TMAX, for many stations."""
+
+    def __init__(self, column, stations, names, dates, values):
+        self.column = column
+        # Station IDs and names, one per row.
+        self.stations = stations
+        self.names = names
+        # Every day in the table, as datetime64[D].
+        self.dates = dates
+        # Masked array, with shape (stations, dates).
+        self.values = values
+
+    def __len__(self):
+        return len(self.stations)
+
+    def get_rolling_means(self, window=7, min_periods=1):
+        """Trailing mean over window days, for every station at once.
+
+        Missing days are left out of each mean. Means over fewer than
+          min_periods days are masked.
+        """
+        present = ~np.ma.getmaskarray(self.values)
+        filled = np.where(present, self.values.filled(0), 0.0)
+
+        # Window sums are differences of cumulative sums.
+        sums = window_sums(filled, window)
+        counts = window_sums(present.astype(np.float64), window)
+
+        enough = counts >= max(min_periods, 1)
+        means = np.divide(sums, counts, out=np.zeros_like(sums),
+            where=enough)
+        return np.ma.masked_array(means, mask=~enough)
+
+    def get_monthly_means(self):
+        """Mean for each station in each month, with shape (stations, 12)."""
+        month_nums = self.dates.astype('datetime64[M]').astype(int) % 12
+        return self._get_group_means(month_nums, 12)
+
+    def get_seasonal_means(self):
+        """Mean for each station in each season, in the order of SEASONS."""
+        month_nums = self.dates.astype('datetime64[M]').astype(int) % 12
+        return self._get_group_means(MONTH_SEASONS[month_nums], 4)
+
+    def plot(self, ax, window=None, **kwargs):
+        """Plot every station on ax, in one call, and return the lines.
+
+        window: Plot rolling means over this many days, instead of
+          daily values.
+        Stations are labeled when there are few enough for a legend.
+        """
+        values = self.get_rolling_means(window) if window else self.values
+        # Masked values become NaN, which leaves gaps in the lines.
+        lines = ax.plot(self.dates, values.filled(np.nan).T, **kwargs)
+        if len(self) <= 10:
+            for line, name in zip(lines, self.names):
+                line.set_label(name)
+            ax.legend()
+        return lines
+
+    def _get_group_means(self, group_nums, num_groups):
+        """Mean of each station's values in each group of dates."""
+        # A one-hot matrix turns group sums into one matrix product.
+        groups = np.zeros((len(self.dates), num_groups))
+        groups[np.arange(len(self.dates)), group_nums] = 1
+
+        present = ~np.ma.getmaskarray(self.values)
+        sums = np.where(present, self.values.filled(0), 0.0) @ groups
+        counts = present.astype(np.float64) @ groups
+        means = np.divide(sums, counts, out=np.zeros_like(sums),
+            where=counts > 0)
+        return np.ma.masked_array(means, mask=counts == 0)
+
+
+def load_station_table(data_dir, column='TMAX', pattern='*_full.csv',
+        num_workers=None):
+    """Load every file in data_dir matching pattern, and return a
+      StationTable for column.
+
+    Files are loaded in a process pool. Where workers are started with
+      spawn, the default on macOS and Windows, each worker imports the
+      main program, so a program that calls this must do so under an
+      `if __name__ == '__main__':` guard.
+    """
+    paths = sorted(Path(data_dir).glob(pattern))
+    if not paths:
+        raise ValueError(f"No files match {pattern} in {data_dir}.")
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        all_weather_data = list(executor.map(load_station_columns, paths,
+            [column] * len(paths)))
+
+    return build_station_table(all_weather_data, column)
+
+def load_station_columns(path, column):
+    """Load the columns a StationTable needs from one file."""
+    return load_weather_data(path, ['STATION', column])
+
+def build_station_table(all_weather_data, column):
+    """Combine loaded files into one StationTable, with one row for each
+      station ID. A file can hold more than one station, and a station
+      can be split across files; each file's dates go in its station's row.
+    """
+    first_date = min(data.dates.min() for data in all_weather_data)
+    last_date = max(data.dates.max() for data in all_weather_data)
+    dates = np.arange(first_date, last_date + 1)
+
+    # Station ID: row number, in the order stations are first seen.
+    station_nums, names = {}, []
+    file_rows = []
+    for data in all_weather_data:
+        file_stations, first_rows, station_rows = np.unique(data['STATION'],
+            return_index=True, return_inverse=True)
+        for station, first_row in zip(file_stations, first_rows):
+            if station not in station_nums:
+                station_nums[station] = len(station_nums)
+                names.append(data['NAME'][first_row])
+
+        # Each row's station number in the table.
+        table_nums = np.array([station_nums[station]
+            for station in file_stations], dtype=int)
+        file_rows.append(table_nums[station_rows])
+
+    values = np.ma.masked_all((len(station_nums), len(dates)))
+    for data, rows in zip(all_weather_data, file_rows):
+        date_nums = (data.dates - first_date).astype(int)
+        values[rows, date_nums] = data[column]
+
+    return StationTable(column, np.array(list(station_nums)),
+        np.array(names), dates, values)
+
+def window_sums(values, window):
+    """Sum of each trailing window along the last axis."""
+    sums = np.cumsum(values, axis=-1)
+    sums[..., window:] -= sums[..., :-window].copy()
+    return sums
@@ -1,9 +1,12 @@
-import sys, os
+import sys, os, json, shutil, stat
+from collections import defaultdict
 from pathlib import Path
 
 import pytest
 
-import utils
+import instrument, utils
+from resource_accounting import ResourceAccounting
+from snapshots import SnapshotStore
 
 
 # --- CLI args ---
@@ -29,6 +32,56 @@ def pytest_addoption(parser):
         default=None,
         help="Django version to test"
     )
+    parser.addoption(
+        "--venv-cache-dir", action="store",
+        default=None,
+        help="Dir for cached Learning Log venvs (default: pytest cache)"
+    )
+    parser.addoption(
+        "--wheelhouse", action="store",
+        default=None,
+        help="Local wheel dir; install Learning Log requirements offline"
+    )
+    parser.addoption(
+        "--ll-server", action="store",
+        default="runserver", choices=["runserver", "wsgi"],
+        help="Server for Learning Log e2e tests"
+    )
+    parser.addoption(
+        "--ll-load-clients", action="store", type=int,
+        default=0,
+        help="Number of concurrent clients for a Learning Log load test"
+    )
+    parser.addoption(
+        "--ll-latency-budget", action="store", type=float,
+        default=None,
+        help="Highest acceptable p95 latency in the load test, in ms"
+    )
+    parser.addoption(
+        "--update-snapshots", action="store_true",
+        default=False,
+        help="Record program outputs in the snapshot store"
+    )
+    parser.addoption(
+        "--resource-report", action="store",
+        default=None,
+        help="Path for the JSON resource usage report"
+    )
+    parser.addoption(
+        "--resource-top", action="store", type=int,
+        default=10,
+        help="Number of slowest tests to show resource usage for"
+    )
+
+def pytest_configure(config):
+    # Record wall time, CPU time, peak RSS, and child processes per test.
+    config.pluginmanager.register(ResourceAccounting(config),
+        "resource_accounting")
+
+    # Keep instrumented programs across sessions, unless the cache
+    #   plugin is disabled with -p no:cacheprovider.
+    if getattr(config, "cache", None) is not None:
+        instrument.set_cache_dir(config.cache.mkdir("instrument"))
 
 
 # --- Fixtures ---
@@ -47,6 +100,124 @@ def python_cmd():
     """Return path to the venv Python interpreter."""
     return utils.get_python_cmd()
 
+@pytest.fixture(scope="session")
+def snapshots(request):
+    """Return the store of expected program outputs.
+    With --update-snapshots, outputs are recorded instead of checked,
+      and written to the store at the end of the session.
+    """
+    store_path = Path(__file__).parent / "reference_files" / "snapshots.zip"
+    store = SnapshotStore(store_path,
+        update=request.config.getoption("--update-snapshots"))
+    yield store
+
+    store.write_pending()
+    store.close()
+
+@pytest.fixture
+def chapter_path(monkeypatch):
+    """Return a function that puts a chapter dir on sys.path, so a test
+      can import the dir's modules in-process, ie
+      chapter_path("chapter_15/random_walks"). Returns the dir.
+    """
+    root_dir = Path(__file__).parents[1]
+
+    def add_chapter_path(chapter_dir):
+        path = root_dir / chapter_dir
+        monkeypatch.syspath_prepend(path)
+        return path
+
+    return add_chapter_path
+
+@pytest.fixture(scope="session")
+def shared_data_dir(tmp_path_factory):
+    """Return a dir with read-only copies of the chapter 16 datasets.
+    Copied once per session, into the same filesystem as each tmp_path,
+      so tests can hardlink data files with utils.link_file() instead
+      of copying them. Files are read-only, so a test can't modify the
+      data that other tests see.
+
+    Subdirs: weather_data/, eq_data/
+    """
+    root_dir = Path(__file__).parents[1] / "chapter_16"
+    data_dirs = [
+        root_dir / "the_csv_file_format" / "weather_data",
+        root_dir / "mapping_global_datasets" / "eq_data",
+    ]
+
+    shared_dir = tmp_path_factory.mktemp("shared_data")
+    for data_dir in data_dirs:
+        dest_dir = shared_dir / data_dir.name
+        shutil.copytree(data_dir, dest_dir)
+        for path in dest_dir.iterdir():
+            path.chmod(stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+
+    return shared_dir
+
+@pytest.fixture(scope="session")
+def weather_frames(shared_data_dir):
+    """Return the weather datasets as DataFrames, keyed by filename.
+    These are shared by all tests; copy a frame before modifying it.
+    """
+    import pandas as pd
+
+    return {
+        path.name: pd.read_csv(path, parse_dates=["DATE"])
+        for path in sorted((shared_data_dir / "weather_data").glob("*.csv"))
+    }
+
+@pytest.fixture(scope="session")
+def eq_arrays(shared_data_dir):
+    """Return read-only arrays of magnitudes, longitudes, latitudes,
+    and titles for each earthquake dataset, keyed by filename.
+    """
+    import numpy as np
+
+    eq_arrays = {}
+    for path in sorted((shared_data_dir / "eq_data").glob("*.geojson")):
+        features = json.loads(path.read_text(encoding="utf-8"))["features"]
+        arrays = {
+            "mags": np.array([f["properties"]["mag"] for f in features],
+                dtype=float),
+            "lons": np.array([f["geometry"]["coordinates"][0]
+                for f in features], dtype=float),
+            "lats": np.array([f["geometry"]["coordinates"][1]
+                for f in features], dtype=float),
+            "titles": np.array([f["properties"]["title"] for f in features]),
+        }
+        for array in arrays.values():
+            array.flags.writeable = False
+        eq_arrays[path.name] = arrays
+
+    return eq_arrays
+
+
+# --- Per-worker timings ---
+
+# Total time and number of tests for each worker, ie "gw0", "gw1".
+#   Without pytest-xdist, everything runs in the "main" worker.
+worker_timings = defaultdict(lambda: [0.0, 0])
+
+def pytest_runtest_logreport(report):
+    """Record how long each test took, on the worker that ran it."""
+    node = getattr(report, "node", None)
+    worker_id = node.gateway.id if node else "main"
+
+    timing = worker_timings[worker_id]
+    timing[0] += report.duration
+    if report.when == "call":
+        timing[1] += 1
+
+def pytest_terminal_summary(terminalreporter):
+    """Show how long each worker spent running tests."""
+    if not worker_timings:
+        return
+
+    terminalreporter.section("Timings per worker")
+    for worker_id, (duration, num_tests) in sorted(worker_timings.items()):
+        terminalreporter.write_line(
+            f"{worker_id}: {num_tests} tests in {duration:.2f}s")
+
 
 # --- Cleanup ---
 
@@ -56,6 +227,18 @@ def pytest_sessionfinish(session, exitstatus):
 
     # Reset any libraries that had a different version installed
     # during the test run.
+    if utils.modified_libraries:
+        reset_test_venv(python_cmd)
+
+    # Show which version of Python was used for tests.
+    cmd = f"{python_cmd} --version"
+    output = utils.run_command(cmd)
+
+    print(f"\n***** Tests were run with: {output}")
+
+
+def reset_test_venv(python_cmd):
+    """Reinstall requirements.txt, undoing check_library_version()."""
     print("\n\n--- Resetting test venv ---\n")
 
     req_txt_path = Path(__file__).parents[1] / "requirements.txt"
@@ -76,9 +259,3 @@ def pytest_sessionfinish(session, exitstatus):
         print("  No packages were modified.")
 
     print("\n--- Finished resetting test venv ---\n")
-
-    # Show which version of Python was used for tests.
-    cmd = f"{python_cmd} --version"
-    output = utils.run_command(cmd)
-
-    print(f"\n***** Tests were run with: {output}")
@@ -0,0 +1,170 @@
+"""Rewrite book programs so they can run unattended in tests.
+
+The programs are parsed and transformed as ASTs, rather than patched as
+  text, so the changes don't depend on line numbers or formatting:
+- plt.show() is replaced by a call to plt.savefig().
+- fig.show() is replaced by calls to fig.write_html() or fig.write_image().
+- Top-level `while True` loops are unrolled to a single pass, dropping
+  the statements that ask for input() or break out of the loop.
+- The random module can be seeded, right after the program's imports.
+
+Rewritten programs are cached on disk, in the pytest cache, by a hash of
+  their source, the options, and this module. A program is only parsed
+  and rewritten again after one of those changes.
+"""
+
+from pathlib import Path
+import ast, hashlib, os
+
+
+# Dir for instrumented sources; set by conftest.py. None means no cache.
+cache_dir = None
+
+# Changes to this module change every cache key.
+_module_hash = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+def set_cache_dir(path):
+    global cache_dir
+    cache_dir = Path(path) if path else None
+
+def instrument_file(src_path, dest_path, **options):
+    """Write an instrumented version of src_path to dest_path.
+    See instrument_source() for options.
+    """
+    source = src_path.read_text(encoding="utf-8")
+    contents = instrument_source(source, **options)
+    dest_path.write_text(contents, encoding="utf-8")
+
+def instrument_source(source, savefig_name=None, html_name=None,
+        image_name=None, seed=None, unroll_while_true=False):
+    """Return an instrumented version of a program's source.
+
+    savefig_name: Replace plt.show() with plt.savefig(savefig_name).
+    html_name: Replace fig.show() with fig.write_html(html_name), and
+      a second write_html() call without plotly.js, ie to "x_nojs.html".
+    image_name: Replace fig.show() with fig.write_image(image_name).
+    seed: Call random.seed(seed) after the program's imports.
+    unroll_while_true: Run the body of top-level `while True` loops once.
+    """
+    options = (savefig_name, html_name, image_name, seed, unroll_while_true)
+    if cache_dir is None:
+        return _instrument(source, *options)
+
+    key_text = f"{_module_hash}\n{options!r}\n{source}"
+    key = hashlib.sha256(key_text.encode("utf-8")).hexdigest()
+    cache_path = cache_dir / f"{key}.py"
+    try:
+        return cache_path.read_text(encoding="utf-8")
+    except OSError:
+        pass
+
+    contents = _instrument(source, *options)
+
+    # Write to a tmp file first, so parallel workers never read a
+    #   partly written file.
+    tmp_path = cache_path.with_name(f"{key}.{os.getpid()}.tmp")
+    tmp_path.write_text(contents, encoding="utf-8")
+    os.replace(tmp_path, cache_path)
+    return contents
+
+
+def _instrument(source, savefig_name, html_name, image_name, seed,
+        unroll_while_true):
+    tree = ast.parse(source)
+    transformer = ProgramInstrumenter(savefig_name, html_name, image_name,
+        unroll_while_true)
+    tree = transformer.visit(tree)
+
+    if seed is not None:
+        insert_seed(tree, seed)
+
+    tree = ast.fix_missing_locations(tree)
+    return ast.unparse(tree) + "\n"
+
+
+class ProgramInstrumenter(ast.NodeTransformer):
+    """Replace show() calls, and unroll `while True` loops."""
+
+    def __init__(self, savefig_name=None, html_name=None, image_name=None,
+            unroll_while_true=False):
+        self.savefig_name = savefig_name
+        self.html_name = html_name
+        self.image_name = image_name
+        self.unroll_while_true = unroll_while_true
+
+    def visit_Expr(self, node):
+        """Replace plt.show() and fig.show() statements."""
+        call = node.value
+        if not (isinstance(call, ast.Call)
+                and isinstance(call.func, ast.Attribute)
+                and call.func.attr == "show"
+                and isinstance(call.func.value, ast.Name)):
+            return node
+
+        owner = call.func.value.id
+        if owner == "plt" and self.savefig_name:
+            return parse_statements(
+                f'plt.savefig("{self.savefig_name}",'
+                ' metadata={"Software": ""})')
+
+        if owner != "plt" and self.html_name:
+            nojs_name = self.html_name.replace(".html", "_nojs.html")
+            return parse_statements(
+                f'{owner}.write_html("{self.html_name}")\n'
+                f'{owner}.write_html("{nojs_name}", include_plotlyjs=False)')
+
+        if owner != "plt" and self.image_name:
+            return parse_statements(
+                f'{owner}.write_image("{self.image_name}")')
+
+        return node
+
+    def visit_Module(self, node):
+        """Unroll top-level `while True` loops, if requested."""
+        self.generic_visit(node)
+        if not self.unroll_while_true:
+            return node
+
+        body = []
+        for stmt in node.body:
+            if is_while_true(stmt):
+                body.extend(s for s in stmt.body if not is_loop_control(s))
+            else:
+                body.append(stmt)
+
+        node.body = body
+        return node
+
+
+def parse_statements(code):
+    """Return the statements in a snippet of code."""
+    return ast.parse(code).body
+
+def is_while_true(stmt):
+    return (isinstance(stmt, ast.While)
+        and isinstance(stmt.test, ast.Constant)
+        and stmt.test.value is True)
+
+def is_loop_control(stmt):
+    """Return True if stmt asks for input(), or may break out of the loop."""
+    for node in ast.walk(stmt):
+        if isinstance(node, ast.Break):
+            return True
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id == "input"):
+            return True
+    return False
+
+def insert_seed(tree, seed):
+    """Seed the random module right after the program's imports."""
+    insert_index = 0
+    for index, stmt in enumerate(tree.body):
+        if isinstance(stmt, (ast.Import, ast.ImportFrom)):
+            insert_index = index + 1
+        elif not (index == 0 and isinstance(stmt, ast.Expr)
+                and isinstance(stmt.value, ast.Constant)):
+            # Stop at the first statement that's not an import or docstring.
+            break
+
+    tree.body[insert_index:insert_index] = parse_statements(
+        f"import random\nrandom.seed({seed!r})")
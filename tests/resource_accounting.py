@@ -0,0 +1,162 @@
+"""pytest plugin that records the resources each test uses.
+
+For each test, from the start of setup to the end of the test call:
+- wall time, and CPU time for the test process and its finished children
+- peak RSS of the test process plus its children
+- number of commands run through utils.run_command()
+- number of distinct child processes
+
+Commands run through utils.run_command() are measured when they exit,
+  from their own rusage, so short-lived programs are always counted.
+  Long-lived children, ie servers, are found by sampling.
+
+Usage is attached to each test report, so it works with pytest-xdist.
+At the end of the session the slowest tests are listed, and a JSON
+  report is written to --resource-report, or to the pytest cache.
+
+Registered in conftest.py.
+"""
+
+from pathlib import Path
+from time import perf_counter
+import json, threading
+
+import psutil
+import pytest
+
+import utils
+
+
+class ResourceMonitor:
+    """Sample the resource usage of this process and its children."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak_rss = 0
+        self.child_pids = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def start(self):
+        self.start_wall = perf_counter()
+        self.start_cpu = self._cpu_time()
+        self.start_commands = len(utils.command_usage)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling, and return the usage since start()."""
+        self._stop.set()
+        self._thread.join()
+        self._take_sample()
+
+        # A command's peak is added to this process's current RSS, since
+        #   this process was running while the command ran.
+        commands = utils.command_usage[self.start_commands:]
+        command_rss = [rss for _, _, rss in commands if rss is not None]
+        if command_rss:
+            self.peak_rss = max(self.peak_rss,
+                self.process.memory_info().rss + max(command_rss))
+        self.child_pids.update(pid for pid, _, _ in commands
+            if pid is not None)
+
+        return {
+            "wall_time": perf_counter() - self.start_wall,
+            "cpu_time": self._cpu_time() - self.start_cpu,
+            "peak_rss_mb": self.peak_rss / 2**20,
+            "commands": len(commands),
+            "child_processes": len(self.child_pids),
+        }
+
+    def _cpu_time(self):
+        """CPU time of this process, and of children that have finished.
+        Children's times include every command run_command() waited for.
+        """
+        times = self.process.cpu_times()
+        return (times.user + times.system
+            + times.children_user + times.children_system)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._take_sample()
+
+    def _take_sample(self):
+        rss = self.process.memory_info().rss
+        for child in self.process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                # Child finished between listing and sampling.
+                continue
+            self.child_pids.add(child.pid)
+
+        self.peak_rss = max(self.peak_rss, rss)
+
+
+class ResourceAccounting:
+    """Record resource usage per test, and report the top offenders."""
+
+    def __init__(self, config):
+        self.config = config
+        self.monitors = {}
+        self.usage = {}
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item):
+        monitor = ResourceMonitor()
+        self.monitors[item.nodeid] = monitor
+        monitor.start()
+        yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        # Attach usage to the call report, or the setup report if
+        #   setup failed. user_properties are copied into the report.
+        monitor = self.monitors.get(item.nodeid)
+        if monitor and (call.when == "call" or call.excinfo):
+            del self.monitors[item.nodeid]
+            item.user_properties.append(("resource_usage", monitor.stop()))
+        yield
+
+    def pytest_runtest_logreport(self, report):
+        for name, value in report.user_properties:
+            if name == "resource_usage":
+                self.usage[report.nodeid] = value
+
+    def pytest_terminal_summary(self, terminalreporter):
+        # Only the controller reports; xdist workers just record usage.
+        if not self.usage or hasattr(self.config, "workerinput"):
+            return
+
+        num_tests = self.config.getoption("--resource-top")
+        top_usage = sorted(self.usage.items(),
+            key=lambda item: item[1]["wall_time"], reverse=True)[:num_tests]
+
+        terminalreporter.section("Resource usage, slowest tests")
+        terminalreporter.write_line(
+            f"{'wall':>8}{'cpu':>8}{'peak rss':>10}{'cmds':>6}{'procs':>7}"
+            "  test")
+        for nodeid, usage in top_usage:
+            terminalreporter.write_line(
+                f"{usage['wall_time']:>7.2f}s{usage['cpu_time']:>7.2f}s"
+                f"{usage['peak_rss_mb']:>8.0f}MB{usage['commands']:>6}"
+                f"{usage['child_processes']:>7}  {nodeid}")
+
+        report_path = self.write_report()
+        if report_path:
+            terminalreporter.write_line(
+                f"\nResource report: {report_path.as_posix()}")
+
+    def write_report(self):
+        """Write usage for all tests as JSON, and return the path."""
+        report_path = self.config.getoption("--resource-report")
+        if report_path:
+            report_path = Path(report_path)
+        elif hasattr(self.config, "cache"):
+            report_path = (self.config.cache.mkdir("resource_accounting")
+                / "report.json")
+        else:
+            return None
+
+        report_path.write_text(json.dumps(self.usage, indent=2))
+        return report_path
@@ -11,12 +11,15 @@ import requests
 def run_e2e_test(app_url):
     print("\nTesting functionality of deployed app...")
 
+    # Reuse one keep-alive connection for all anonymous requests.
+    anon_session = requests.Session()
+
     # --- Anonymous home page ---
     print("  Checking anonymous home page...")
 
     # Note: app_url has a trailing slash.
     # app_url = sys.argv[1]
-    r = requests.get(app_url)
+    r = anon_session.get(app_url)
 
     assert r.status_code == 200
     assert "Track your learning." in r.text
@@ -30,7 +33,7 @@ def run_e2e_test(app_url):
     # Note that direct django testing detects a redirect; requests just sees
     #   the login page.
     url = f"{app_url}topics"
-    r = requests.get(url)
+    r = anon_session.get(url)
 
     assert r.status_code == 200
     assert "Log in to your account." in r.text
@@ -41,7 +44,7 @@ def run_e2e_test(app_url):
     # --- Anonymous register page ---
     print("  Checking that anonymous register page is available...")
     url = f"{app_url}accounts/register"
-    r = requests.get(url)
+    r = anon_session.get(url)
 
     assert r.status_code == 200
     assert "Log in" in r.text
@@ -52,7 +55,7 @@ def run_e2e_test(app_url):
     # --- Anonymous login page ---
     print("  Checking that anonymous login page is available...")
     url = f"{app_url}accounts/login/"
-    r = requests.get(url)
+    r = anon_session.get(url)
 
     assert r.status_code == 200
     assert "Log in to your account." in r.text
@@ -65,6 +68,7 @@ def run_e2e_test(app_url):
 
     register_url = f"{app_url}accounts/register/"
 
+    anon_session.close()
     s = requests.Session()
     s.get(register_url)
 
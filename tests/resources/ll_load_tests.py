@@ -0,0 +1,214 @@
+"""Load test for the LL project.
+Replays the e2e flows from many concurrent clients, and reports
+  requests/sec and latency percentiles for each endpoint.
+
+Works for local and remote deployments:
+  $ python ll_load_tests.py http://localhost:8008/ --clients 20
+
+Each client is a coroutine with its own requests session. requests is
+  blocking, so each request runs in a worker thread; the event loop
+  only coordinates the clients.
+"""
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+import argparse, asyncio, re, sys, uuid
+
+import requests
+
+
+def run_load_test(app_url, num_clients=10, num_entries=3,
+        latency_budget=None):
+    """Run the load test, print a report, and enforce the latency budget.
+
+    latency_budget is the highest acceptable p95 latency for any
+      endpoint, in ms. If it's None, nothing is enforced.
+    Returns the recorded latencies, keyed by endpoint.
+    """
+    print(f"\nLoad testing app with {num_clients} clients...")
+
+    start = perf_counter()
+    latencies = asyncio.run(
+        run_clients(app_url, num_clients, num_entries))
+    elapsed = perf_counter() - start
+
+    stats = summarize(latencies, elapsed)
+    print_report(stats, elapsed)
+
+    if latency_budget is not None:
+        over_budget = [
+            f"{endpoint}: p95 {endpoint_stats['p95']:.1f}ms"
+            for endpoint, endpoint_stats in stats.items()
+            if endpoint_stats["p95"] > latency_budget
+        ]
+        assert not over_budget, (
+            f"Latency budget of {latency_budget}ms exceeded:\n  "
+            + "\n  ".join(over_budget))
+
+    return latencies
+
+
+async def run_clients(app_url, num_clients, num_entries):
+    """Run all clients concurrently, and merge their latencies."""
+    # Each client only makes one request at a time, so one thread per
+    #   client is enough.
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=num_clients))
+
+    results = await asyncio.gather(*[
+        LoadClient(app_url).run_flows(num_entries)
+        for _ in range(num_clients)
+    ])
+
+    latencies = defaultdict(list)
+    for client_latencies in results:
+        for endpoint, times in client_latencies.items():
+            latencies[endpoint].extend(times)
+
+    return latencies
+
+
+class LoadClient:
+    """One user working through the LL flows."""
+
+    def __init__(self, app_url):
+        # Note: app_url has a trailing slash.
+        self.app_url = app_url
+        self.session = requests.Session()
+        self.latencies = defaultdict(list)
+
+        # Usernames need to be unique across clients and runs.
+        self.username = f"load_{uuid.uuid4().hex[:12]}"
+        self.password = "load_Pw_23_user"
+
+    async def run_flows(self, num_entries):
+        """Register, log out and back in, then make a topic and entries."""
+        await self.register()
+        await self.log_out()
+        await self.log_in()
+        topic_id = await self.new_topic()
+        for entry_num in range(num_entries):
+            await self.new_entry(topic_id, entry_num)
+        await self.view_topic(topic_id)
+
+        self.session.close()
+        return self.latencies
+
+    async def register(self):
+        url = f"{self.app_url}accounts/register/"
+        data = {
+            'username': self.username,
+            'password1': self.password,
+            'password2': self.password,
+        }
+        r = await self.submit_form("register", url, data)
+        assert f"Hello, {self.username}." in r.text
+
+    async def log_out(self):
+        # The logout form is on every page, so use the home page's token.
+        await self.request("home", "get", self.app_url)
+        url = f"{self.app_url}accounts/logout/"
+        data = {'csrfmiddlewaretoken': self.session.cookies['csrftoken']}
+        r = await self.request("logout", "post", url, data=data,
+            headers={'referer': self.app_url})
+        assert "Log in" in r.text
+
+    async def log_in(self):
+        url = f"{self.app_url}accounts/login/"
+        data = {'username': self.username, 'password': self.password}
+        r = await self.submit_form("login", url, data)
+        assert f"Hello, {self.username}." in r.text
+
+    async def new_topic(self):
+        url = f"{self.app_url}new_topic/"
+        data = {'text': f"Topic for {self.username}"}
+        r = await self.submit_form("new_topic", url, data)
+        assert data['text'] in r.text
+
+        # Find the link to the topic that was just created.
+        topic_id_re = r'<a href="/topics/(\d+)/">\s*' + re.escape(data['text'])
+        return re.search(topic_id_re, r.text).group(1)
+
+    async def new_entry(self, topic_id, entry_num):
+        url = f"{self.app_url}new_entry/{topic_id}/"
+        data = {'text': f"Entry {entry_num} from {self.username}."}
+        r = await self.submit_form("new_entry", url, data)
+        assert data['text'] in r.text
+
+    async def view_topic(self, topic_id):
+        url = f"{self.app_url}topics/{topic_id}/"
+        r = await self.request("topic", "get", url)
+        assert r.status_code == 200
+
+    async def submit_form(self, endpoint, url, data):
+        """Load a form page, then post data to it with the csrf token."""
+        await self.request(endpoint, "get", url)
+        data['csrfmiddlewaretoken'] = self.session.cookies['csrftoken']
+        r = await self.request(endpoint, "post", url, data=data,
+            headers={'referer': url})
+        assert r.status_code == 200
+        return r
+
+    async def request(self, endpoint, method, url, **kwargs):
+        """Make a request in a worker thread, and record its latency."""
+        send = getattr(self.session, method)
+        start = perf_counter()
+        r = await asyncio.to_thread(send, url, **kwargs)
+        latency = (perf_counter() - start) * 1000
+
+        self.latencies[f"{method.upper()} {endpoint}"].append(latency)
+        return r
+
+
+def summarize(latencies, elapsed):
+    """Return throughput and latency percentiles for each endpoint."""
+    stats = {}
+    for endpoint, times in sorted(latencies.items()):
+        times = sorted(times)
+        stats[endpoint] = {
+            'requests': len(times),
+            'rps': len(times) / elapsed,
+            'p50': percentile(times, 50),
+            'p90': percentile(times, 90),
+            'p95': percentile(times, 95),
+            'p99': percentile(times, 99),
+            'max': times[-1],
+        }
+
+    return stats
+
+
+def percentile(sorted_times, pct):
+    """Return the pct percentile of sorted_times, nearest-rank method."""
+    rank = max(1, round(pct / 100 * len(sorted_times)))
+    return sorted_times[rank - 1]
+
+
+def print_report(stats, elapsed):
+    num_requests = sum(s['requests'] for s in stats.values())
+    print(f"  {num_requests} requests in {elapsed:.2f}s"
+        f" ({num_requests / elapsed:.1f} requests/sec)")
+
+    print(f"  {'endpoint':<16}{'reqs':>6}{'req/s':>8}"
+        f"{'p50':>8}{'p90':>8}{'p95':>8}{'p99':>8}{'max':>8}  (ms)")
+    for endpoint, s in stats.items():
+        print(f"  {endpoint:<16}{s['requests']:>6}{s['rps']:>8.1f}"
+            f"{s['p50']:>8.1f}{s['p90']:>8.1f}{s['p95']:>8.1f}"
+            f"{s['p99']:>8.1f}{s['max']:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the LL project.")
+    parser.add_argument("app_url", help="URL of the app, with trailing slash")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--entries", type=int, default=3)
+    parser.add_argument("--latency-budget", type=float, default=None,
+        help="Highest acceptable p95 latency, in ms")
+    args = parser.parse_args()
+
+    try:
+        run_load_test(args.app_url, args.clients, args.entries,
+            args.latency_budget)
+    except AssertionError as e:
+        sys.exit(str(e))
@@ -0,0 +1,32 @@
+"""Serve the LL project with a plain WSGI server, for e2e tests.
+
+Run this with the project's venv, from the project dir:
+  $ ll_env/bin/python -u wsgi_server.py 8008
+
+Unlike runserver, this runs in a single process with no autoreloader
+  and no system checks, so it's ready almost as soon as it starts.
+  Static files are not served.
+"""
+
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import make_server, WSGIServer
+import sys
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    """Handle each request in its own thread, like runserver."""
+    daemon_threads = True
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1])
+
+    # Import the project from the current directory.
+    sys.path.insert(0, str(Path.cwd()))
+    from ll_project.wsgi import application
+
+    with make_server('localhost', port, application,
+            server_class=ThreadingWSGIServer) as server:
+        print(f"Serving Learning Log with wsgiref on port {port}")
+        server.serve_forever()
@@ -0,0 +1,392 @@
+"""Benchmark the example projects, and compare against earlier runs.
+
+Each benchmark times one piece of a book project: filling a random walk,
+  the dice-rolling loops, the weather and earthquake data loaders, one
+  frame of Alien Invasion, and the main Learning Log views.
+
+Usage, from the tests/ dir:
+  $ python run_benchmarks.py
+  $ python run_benchmarks.py -k dice -r 20 --no-save
+
+Results are kept as JSON, one file per machine, in benchmark_results/.
+Each run is compared against the previous run on the same machine, and
+  a benchmark is flagged when it's slower by more than --threshold and
+  a Mann-Whitney U test says the slowdown is significant. A run with a
+  flagged benchmark isn't saved, so it never becomes the baseline,
+  unless the slowdown is accepted with --accept.
+
+Benchmarks that need a library that isn't installed are skipped. The
+  Learning Log benchmark needs Django; to run it, use the Python
+  interpreter from a venv that has the project's requirements.
+"""
+
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+from time import perf_counter
+import argparse, ast, importlib.util, io, json, math, os, platform
+import statistics, sys
+from datetime import datetime
+
+
+root_dir = Path(__file__).parents[1]
+results_dir = Path(__file__).parent / "benchmark_results"
+
+# name: function that does any setup, and returns the function to time.
+benchmarks = {}
+
+def benchmark(func):
+    """Register a benchmark setup function."""
+    benchmarks[func.__name__] = func
+    return func
+
+
+# --- Benchmarks ---
+
+@benchmark
+def random_walk_fill():
+    """Fill a 50,000-point walk, as rw_visual.py does."""
+    rw_module = load_module(root_dir / "chapter_15/random_walks/random_walk.py")
+
+    def run():
+        rw = rw_module.RandomWalk(50_000)
+        rw.fill_walk()
+
+    return run
+
+@benchmark
+def random_walk_fill_numpy():
+    """Fill a 50,000-point walk with NumpyRandomWalk."""
+    rw_path = root_dir / "chapter_15/random_walks"
+    sys.path.insert(0, str(rw_path))
+    rw_module = load_module(rw_path / "random_walk_numpy.py")
+
+    def run():
+        rw = rw_module.NumpyRandomWalk(50_000)
+        rw.fill_walk()
+
+    return run
+
+@benchmark
+def dice_rolls():
+    """Roll two D6 50,000 times, and count results with list.count()."""
+    die_module = load_module(root_dir / "chapter_15/rolling_dice/die.py")
+    die_1, die_2 = die_module.Die(), die_module.Die()
+
+    def run():
+        results = [die_1.roll() + die_2.roll() for _ in range(50_000)]
+        max_result = die_1.num_sides + die_2.num_sides
+        return [results.count(value) for value in range(2, max_result+1)]
+
+    return run
+
+@benchmark
+def dice_rolls_numpy():
+    """Roll two D6 50,000 times with DiceSet, and count with bincount()."""
+    dice_path = root_dir / "chapter_15/rolling_dice"
+    sys.path.insert(0, str(dice_path))
+    die_module = load_module(dice_path / "die.py")
+    dice_module = load_module(dice_path / "dice_numpy.py")
+    dice = dice_module.DiceSet([die_module.Die(), die_module.Die()])
+
+    def run():
+        return dice.get_frequencies(50_000)
+
+    return run
+
+@benchmark
+def weather_sitka_csv():
+    """Load dates, highs and lows in sitka_highs_lows.py."""
+    path = root_dir / "chapter_16/the_csv_file_format/sitka_highs_lows.py"
+    return data_loading_code(path)
+
+@benchmark
+def weather_death_valley_csv():
+    """Load data, with missing values, in death_valley_highs_lows.py."""
+    path = (root_dir / "chapter_16/the_csv_file_format"
+        / "death_valley_highs_lows.py")
+    return data_loading_code(path)
+
+@benchmark
+def weather_loader():
+    """Load the data in sitka_highs_lows.py, with weather_loader."""
+    weather_path = root_dir / "chapter_16/the_csv_file_format"
+    loader_module = load_module(weather_path / "weather_loader.py")
+    path = weather_path / "weather_data/sitka_weather_2021_simple.csv"
+
+    def run():
+        return loader_module.load_weather_data(path, ["TMAX", "TMIN"])
+
+    return run
+
+@benchmark
+def eq_geojson_load():
+    """Load the 1-day earthquake feed in eq_explore_data.py."""
+    path = (root_dir / "chapter_16/mapping_global_datasets"
+        / "eq_explore_data.py")
+    return data_loading_code(path)
+
+@benchmark
+def eq_stream_load():
+    """Stream mags, lons, lats and titles from the 1-day earthquake feed."""
+    eq_path = root_dir / "chapter_16/mapping_global_datasets"
+    stream_module = load_module(eq_path / "eq_stream.py")
+    path = eq_path / "eq_data/eq_data_1_day_m1.geojson"
+
+    def run():
+        return stream_module.load_eq_columns(path)
+
+    return run
+
+@benchmark
+def alien_invasion_frame():
+    """Run one frame of an active Alien Invasion game, off screen."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    ai_path = root_dir / "chapter_14" / "scoring"
+    sys.path.insert(0, str(ai_path))
+
+    with working_dir(ai_path):
+        from alien_invasion import AlienInvasion
+        ai_game = AlienInvasion()
+    ai_game.game_active = True
+
+    def run():
+        if not ai_game.aliens:
+            ai_game._create_fleet()
+        ai_game._fire_bullet()
+        ai_game.ship.update()
+        ai_game._update_bullets()
+        ai_game._update_aliens()
+        ai_game._update_screen()
+
+    return run
+
+@benchmark
+def learning_log_views():
+    """Render the topics and topic pages for a user with 50 entries."""
+    project_dir = root_dir / "chapter_20" / "deploying_learning_log"
+    sys.path.insert(0, str(project_dir))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ll_project.settings")
+
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.test.utils import setup_test_environment
+    from django.test import Client
+
+    # Use an in-memory database, so the project's db is never touched.
+    settings.DATABASES["default"]["NAME"] = ":memory:"
+    django.setup()
+    setup_test_environment()
+    call_command("migrate", verbosity=0)
+
+    from django.contrib.auth.models import User
+    from learning_logs.models import Topic, Entry
+
+    user = User.objects.create_user("bench_user", password="bench_Pw_23")
+    topic = Topic.objects.create(text="Chess", owner=user)
+    for entry_num in range(50):
+        Entry.objects.create(topic=topic, text=f"Entry {entry_num}. " * 20)
+
+    client = Client()
+    client.force_login(user)
+
+    def run():
+        for url in ["/", "/topics/", f"/topics/{topic.id}/"]:
+            r = client.get(url)
+            assert r.status_code == 200
+
+    return run
+
+
+# --- Helper functions ---
+
+def load_module(path):
+    """Import a module from a book project, under a unique name."""
+    module_name = "bench_" + path.stem
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def data_loading_code(path):
+    """Return a function that runs the data loading part of a program.
+    That's every top-level statement before the first one that uses
+      plt, fig, or ax. Output is discarded.
+    """
+    tree = ast.parse(path.read_text())
+    plot_names = {"plt", "fig", "ax"}
+
+    body = []
+    for node in tree.body:
+        names = {n.id for n in ast.walk(node) if isinstance(n, ast.Name)}
+        if names & plot_names and not isinstance(node,
+                (ast.Import, ast.ImportFrom)):
+            break
+        body.append(node)
+
+    code = compile(ast.Module(body=body, type_ignores=[]), str(path), "exec")
+
+    def run():
+        with working_dir(path.parent), redirect_stdout(io.StringIO()):
+            exec(code, {"__name__": "__bench__"})
+
+    return run
+
+@contextmanager
+def working_dir(path):
+    """Run a block in path, for programs that use relative paths."""
+    original_dir = Path.cwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(original_dir)
+
+def time_benchmark(func, repeat):
+    """Return repeat timings of func, in seconds, after one warmup run."""
+    func()
+
+    samples = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        samples.append(perf_counter() - start)
+
+    return samples
+
+def mann_whitney_p(baseline, current):
+    """One-sided p-value that current is slower than baseline.
+    Uses the normal approximation of the Mann-Whitney U statistic,
+      which is reasonable for 8 or more samples per group.
+    """
+    n1, n2 = len(current), len(baseline)
+    combined = sorted([(x, 0) for x in current] + [(x, 1) for x in baseline])
+
+    # Average ranks for ties.
+    ranks = [0.0] * len(combined)
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j+1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j+1):
+            ranks[k] = (i + j) / 2 + 1
+        i = j + 1
+
+    rank_sum = sum(r for r, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    mean_u = n1 * n2 / 2
+    sd_u = math.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+    if sd_u == 0:
+        return 1.0
+
+    z = (u - mean_u) / sd_u
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+def get_baseline(history):
+    """Return the samples for each benchmark from the most recent run that
+      includes it. Runs with -k, or with skipped benchmarks, only hold
+      some benchmarks, so the last run alone isn't a full baseline.
+    """
+    baseline = {}
+    for run in reversed(history):
+        for name, samples in run["results"].items():
+            baseline.setdefault(name, samples)
+    return baseline
+
+def get_machine_id():
+    """Identify this machine and Python version, for the results file."""
+    machine_id = (f"{platform.node()}-{platform.system()}"
+        f"-{platform.machine()}-py{sys.version_info[0]}.{sys.version_info[1]}")
+    return "".join(c if c.isalnum() or c in "-." else "_"
+        for c in machine_id.lower())
+
+
+# --- Running and reporting ---
+
+def main():
+    args = parse_args()
+
+    results_path = args.results_dir / f"{get_machine_id()}.json"
+    history = []
+    if results_path.exists():
+        history = json.loads(results_path.read_text())["runs"]
+    baseline = get_baseline(history)
+
+    names = [name for name in benchmarks
+        if not args.k or any(k in name for k in args.k)]
+
+    results, regressions = {}, []
+    print(f"***** Benchmarking on {get_machine_id()}\n")
+    print(f"  {'benchmark':<26}{'median':>10}{'stdev':>10}{'baseline':>10}"
+        f"{'change':>9}{'p':>8}")
+    for name in names:
+        try:
+            func = benchmarks[name]()
+        except ImportError as e:
+            print(f"  {name:<26}skipped ({e})")
+            continue
+
+        samples = time_benchmark(func, args.repeat)
+        results[name] = samples
+        line = (f"  {name:<26}{statistics.median(samples)*1000:>8.2f}ms"
+            f"{statistics.stdev(samples)*1000:>8.2f}ms")
+
+        if name in baseline:
+            old_median = statistics.median(baseline[name])
+            change = statistics.median(samples) / old_median - 1
+            p = mann_whitney_p(baseline[name], samples)
+            line += f"{old_median*1000:>8.2f}ms{change:>+9.1%}{p:>8.3f}"
+
+            if change > args.threshold and p < args.alpha:
+                regressions.append(name)
+                line += "  REGRESSION"
+
+        print(line)
+
+    if regressions and not args.accept and not args.no_save:
+        print("\n***** Not saving results; use --accept to make this run"
+            " the baseline.")
+    elif not args.no_save and results:
+        history.append({
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "results": results,
+        })
+        args.results_dir.mkdir(parents=True, exist_ok=True)
+        results_path.write_text(json.dumps({"runs": history}, indent=2))
+        print(f"\n***** Saved results to {results_path.as_posix()}")
+
+    if regressions:
+        print(f"\n***** Regressions: {', '.join(regressions)}")
+        if not args.accept:
+            sys.exit(1)
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the example projects.")
+    parser.add_argument("-k", action="append",
+        help="Only run benchmarks whose name contains this string")
+    parser.add_argument("-r", "--repeat", type=repeat_count, default=10,
+        help="Timed runs for each benchmark; at least 2")
+    parser.add_argument("--threshold", type=float, default=0.05,
+        help="Smallest slowdown to flag, ie 0.05 for 5%%")
+    parser.add_argument("--alpha", type=float, default=0.01,
+        help="Significance level for flagging a slowdown")
+    parser.add_argument("--results-dir", type=Path, default=results_dir)
+    parser.add_argument("--no-save", action="store_true",
+        help="Compare against the baseline, without saving this run")
+    parser.add_argument("--accept", action="store_true",
+        help="Save this run even if it has regressions")
+    return parser.parse_args()
+
+def repeat_count(value):
+    """At least 2 runs are needed for a stdev, and for the U test."""
+    repeat = int(value)
+    if repeat < 2:
+        raise argparse.ArgumentTypeError("must be at least 2")
+    return repeat
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Run the test modules for a library against several versions of it.
+
+Each (library, version) pair gets its own venv, built once and reused on
+  later runs. The test modules for each pair run in parallel, each in
+  its own venv, so the shared test venv is never modified and doesn't
+  need to be reset afterwards.
+
+Usage, from the tests/ dir:
+  $ python run_version_matrix.py matplotlib=3.7.3 matplotlib=3.8.2 plotly=5.18.0
+  $ python run_version_matrix.py pygame=2.5.2 -j 2 -- -k ai_game
+
+Results from all runs are merged into one JUnit XML report.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import utils
+
+
+# Test modules that exercise each library.
+library_test_modules = {
+    "matplotlib": ["test_matplotlib_programs.py"],
+    "plotly": ["test_plotly_programs.py"],
+    "pygame": ["test_alien_invasion.py"],
+}
+
+tests_dir = Path(__file__).parent
+req_txt_path = Path(__file__).parents[1] / "requirements.txt"
+
+
+def main():
+    args = parse_args()
+
+    matrix = [parse_pair(pair) for pair in args.pairs]
+    args.cache_dir.mkdir(parents=True, exist_ok=True)
+    args.report_dir.mkdir(parents=True, exist_ok=True)
+
+    # Build any missing envs, then run the tests in each env.
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        env_dirs = list(executor.map(
+            lambda pair: build_env(args.cache_dir, *pair, args.wheelhouse),
+            matrix))
+
+        runs = [
+            (lib_name, lib_version, env_dir)
+            for (lib_name, lib_version), env_dir in zip(matrix, env_dirs)
+        ]
+        report_paths = list(executor.map(
+            lambda run: run_tests(args.report_dir, *run, args.pytest_args),
+            runs))
+
+    merged_path = args.report_dir / "version_matrix.xml"
+    failed = merge_reports(report_paths, merged_path)
+    print(f"\n***** Merged report: {merged_path.as_posix()}")
+
+    sys.exit(1 if failed else 0)
+
+
+def parse_args():
+    """Parse CLI args."""
+    parser = argparse.ArgumentParser(
+        description="Run library tests against several library versions.")
+    parser.add_argument("pairs", nargs="+", metavar="LIBRARY=VERSION",
+        help=f"One of {', '.join(library_test_modules)}, and a version")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+        help="Number of envs to build or test at once")
+    parser.add_argument("--cache-dir", type=Path,
+        default=tests_dir / ".venv_matrix",
+        help="Dir where the envs are kept between runs")
+    parser.add_argument("--report-dir", type=Path,
+        default=tests_dir / ".venv_matrix" / "reports",
+        help="Dir for the JUnit XML reports")
+    parser.add_argument("--wheelhouse", default=None,
+        help="Local wheel dir; build envs without network access")
+
+    # Anything after -- is passed through to pytest.
+    argv = sys.argv[1:]
+    pytest_args = []
+    if "--" in argv:
+        split_index = argv.index("--")
+        argv, pytest_args = argv[:split_index], argv[split_index+1:]
+
+    args = parser.parse_args(argv)
+    args.pytest_args = pytest_args
+
+    return args
+
+
+def parse_pair(pair):
+    """Split "matplotlib=3.8.2" into ("matplotlib", "3.8.2")."""
+    lib_name, _, lib_version = pair.partition("=")
+    lib_version = lib_version.lstrip("=")
+    if lib_name not in library_test_modules or not lib_version:
+        sys.exit(f"Invalid pair {pair!r}; use LIBRARY=VERSION, with one of:"
+            f" {', '.join(library_test_modules)}")
+
+    return lib_name, lib_version
+
+
+def build_env(cache_dir, lib_name, lib_version, wheelhouse=None):
+    """Return a venv with requirements.txt, and lib_name==lib_version.
+    The venv is built in a scratch dir and moved into place when it's
+      complete, so an interrupted build is never reused.
+    """
+    env_dir = cache_dir / f"{lib_name}-{lib_version}"
+    if env_dir.exists():
+        print(f"***** Using env: {env_dir.as_posix()}")
+        return env_dir
+
+    print(f"***** Building env: {env_dir.as_posix()}")
+    build_dir = Path(tempfile.mkdtemp(dir=cache_dir, prefix="building-"))
+    python_cmd = utils.get_python_cmd()
+    utils.run_command(f"{python_cmd} -m venv {build_dir.as_posix()}")
+
+    env_python_cmd = utils.get_venv_python_cmd(build_dir)
+    pip_cmd = f"{env_python_cmd} -m pip install"
+    if wheelhouse:
+        wheelhouse = Path(wheelhouse).resolve().as_posix()
+        pip_cmd += f" --no-index --find-links {wheelhouse}"
+
+    utils.run_command(f"{pip_cmd} -r {req_txt_path.as_posix()}")
+    utils.run_command(f"{pip_cmd} {lib_name}=={lib_version}")
+
+    try:
+        build_dir.rename(env_dir)
+    except OSError:
+        # Another run finished the same env first.
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+    return env_dir
+
+
+def run_tests(report_dir, lib_name, lib_version, env_dir, pytest_args):
+    """Run the test modules for lib_name in env_dir.
+    Returns the path to the JUnit XML report for this run.
+    """
+    run_name = f"{lib_name}-{lib_version}"
+    report_path = report_dir / f"{run_name}.xml"
+    basetemp = report_dir / run_name
+    report_path.unlink(missing_ok=True)
+
+    env_python_cmd = utils.get_venv_python_cmd(env_dir)
+    cmd = [env_python_cmd, "-m", "pytest", "-q",
+        *library_test_modules[lib_name],
+        f"--{lib_name}-version", lib_version,
+        "--junitxml", report_path.as_posix(),
+        "--basetemp", basetemp.as_posix(),
+        *pytest_args]
+
+    print(f"***** Running tests with {run_name}...")
+    result = subprocess.run(cmd, cwd=tests_dir, capture_output=True,
+        text=True, encoding="utf-8")
+    log_path = report_dir / f"{run_name}.log"
+    log_path.write_text(result.stdout + result.stderr, encoding="utf-8")
+
+    # pytest writes a report unless it failed before collection.
+    if not report_path.exists():
+        print(f"***** {run_name}: pytest exited with {result.returncode}"
+            f"; see {log_path.as_posix()}")
+
+    return report_path
+
+
+def merge_reports(report_paths, merged_path):
+    """Merge JUnit XML reports into one file, and print a summary.
+    Returns True if any run had failures or errors.
+    """
+    merged = ET.Element("testsuites")
+    failed = False
+
+    print("\n***** Version matrix results:")
+    for report_path in report_paths:
+        run_name = report_path.stem
+        if not report_path.exists():
+            print(f"*****   {run_name}: no report")
+            failed = True
+            continue
+
+        root = ET.parse(report_path).getroot()
+        suites = [root] if root.tag == "testsuite" else list(root)
+        for suite in suites:
+            suite.set("name", run_name)
+            merged.append(suite)
+
+            counts = {
+                key: int(suite.get(key, 0))
+                for key in ("tests", "failures", "errors", "skipped")
+            }
+            if counts["failures"] or counts["errors"]:
+                failed = True
+
+            summary = ", ".join(f"{v} {k}" for k, v in counts.items())
+            print(f"*****   {run_name}: {summary},"
+                f" {float(suite.get('time', 0)):.1f}s")
+
+    ET.ElementTree(merged).write(merged_path, encoding="utf-8",
+        xml_declaration=True)
+    return failed
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Store of expected program outputs, in one compressed file.
+
+Snapshots are kept in a zip file, keyed by program path and library
+  version, ie "chapter_01/hello_world.py@any". Outputs that don't depend
+  on a library version use the version "any". Images and HTML files are
+  keyed by the library that made them, ie
+  "chapter_15/random_walks/rw_visual.py@matplotlib-3.8.2".
+
+The zip's central directory is the index: nothing is read until a test
+  asks for a snapshot, and then only that snapshot is decompressed. So
+  adding more programs doesn't slow down collection.
+
+Run pytest with --update-snapshots to record outputs instead of checking
+  them. Updates are written at the end of the session, under a file lock,
+  so xdist workers can update the same store safely.
+"""
+
+from pathlib import Path
+import os, tempfile, zipfile
+
+from filelock import FileLock
+import pytest
+
+
+class SnapshotStore:
+    """Expected outputs, stored in a zip file."""
+
+    def __init__(self, path, update=False):
+        self.path = Path(path)
+        self.update = update
+        self.pending = {}
+        self._zip_file = None
+        self._name_set = None
+
+    def key(self, program_path, version="any"):
+        return f"{program_path}@{version}"
+
+    def keys(self):
+        """Return all snapshot keys, without reading any snapshots."""
+        if not self.path.exists():
+            return []
+        return self._open().namelist()
+
+    def get(self, program_path, version="any"):
+        """Return the expected text output, or None if there's no snapshot."""
+        expected = self.get_bytes(program_path, version)
+        if expected is None:
+            return None
+        return expected.decode("utf-8")
+
+    def get_bytes(self, program_path, version="any"):
+        """Return the expected output as bytes, or None if there's no
+          snapshot. Falls back to the "any" version if there's no snapshot
+          for version.
+        """
+        if not self.path.exists():
+            return None
+
+        names = self._names()
+        for key in (self.key(program_path, version),
+                self.key(program_path)):
+            if key in names:
+                return self._open().read(key)
+
+        return None
+
+    def check(self, program_path, output, version="any"):
+        """Assert that text output matches the snapshot.
+        With --update-snapshots, record output instead.
+        """
+        if self.update:
+            self.pending[self.key(program_path, version)] = (
+                output.encode("utf-8"))
+            return
+
+        expected = self._get_expected(program_path, version)
+        assert output == expected.decode("utf-8")
+
+    def check_file(self, program_path, output_path, version="any"):
+        """Assert that an output file, ie an image, matches the snapshot.
+        With --update-snapshots, record the file instead.
+        """
+        output = Path(output_path).read_bytes()
+        if self.update:
+            self.pending[self.key(program_path, version)] = output
+            return
+
+        expected = self._get_expected(program_path, version)
+        assert output == expected, (f"{output_path} doesn't match the"
+            f" snapshot for {program_path} ({version}).")
+
+    def write_pending(self):
+        """Merge pending snapshots into the store, under a file lock."""
+        if not self.pending:
+            return
+
+        self.close()
+        lock_path = self.path.with_name(self.path.name + ".lock")
+        with FileLock(str(lock_path)):
+            # Re-read the store, in case another worker updated it.
+            snapshots = {}
+            if self.path.exists():
+                with zipfile.ZipFile(self.path) as zip_file:
+                    snapshots = {
+                        name: zip_file.read(name)
+                        for name in zip_file.namelist()
+                    }
+
+            snapshots.update(self.pending)
+
+            # Write a new file and swap it in, so readers never see
+            #   a partly written store.
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent,
+                suffix=".zip")
+            os.close(fd)
+            with zipfile.ZipFile(tmp_path, "w") as zip_file:
+                for name in sorted(snapshots):
+                    # Fixed timestamps keep the file stable in git.
+                    info = zipfile.ZipInfo(name,
+                        date_time=(1980, 1, 1, 0, 0, 0))
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    zip_file.writestr(info, snapshots[name])
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+
+        print(f"\n***** Updated {len(self.pending)} snapshots"
+            f" in {self.path.name}")
+        self.pending = {}
+
+    def close(self):
+        if self._zip_file:
+            self._zip_file.close()
+            self._zip_file = None
+            self._name_set = None
+
+    def _get_expected(self, program_path, version):
+        expected = self.get_bytes(program_path, version)
+        if expected is None:
+            pytest.fail(f"No snapshot for {program_path} ({version});"
+                " run with --update-snapshots to record one.")
+        return expected
+
+    def _names(self):
+        if self._name_set is None:
+            self._name_set = set(self._open().namelist())
+        return self._name_set
+
+    def _open(self):
+        if self._zip_file is None:
+            self._zip_file = zipfile.ZipFile(self.path)
+        return self._zip_file
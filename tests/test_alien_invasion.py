@@ -1,9 +1,7 @@
 """Test the Alien Invasion game."""
 
 from pathlib import Path
-import os
 import importlib
-import sys
 
 import pytest
 
@@ -20,17 +18,18 @@ def check_pygame_version(request, python_cmd):
     utils.check_library_version(request, python_cmd, "pygame")
 
 
-def test_ai_game():
+def test_ai_game(monkeypatch):
     """Test basic functionality of the game."""
 
     # Add source path to sys.path, so we can import AlienInvasion.
+    #   monkeypatch restores sys.path and the cwd after the test.
     ai_path = Path(__file__).parents[1] / "chapter_14" / "scoring"
-    sys.path.insert(0, str(ai_path))
+    monkeypatch.syspath_prepend(str(ai_path))
     from alien_invasion import AlienInvasion
     from ai_tester import AITester
     
     # Create a game instance, and an AITester instance, and run game.
-    os.chdir(ai_path)
+    monkeypatch.chdir(ai_path)
     ai_game = AlienInvasion()
     ai_tester = AITester(ai_game)
     ai_tester.run_game()
@@ -1,26 +1,37 @@
 """Test the Learning Log project.
 
 - Copy project to tmp dir.
-- Build a venv there.
-- Install [specified] version of Django there.
+- Build a venv there, overlaying a cached venv that has the
+  [specified] version of Django installed.
 - Run migrations.
-- Start runserver.
+- Start runserver, or a plain WSGI server with --ll-server wsgi.
 - Run functionality tests.
+- Optionally, run a load test: --ll-load-clients 20 --ll-latency-budget 500
+
+Cached venvs are keyed by Python version and a hash of requirements.txt,
+  and are stored in the pytest cache unless --venv-cache-dir is used.
+To run offline, fill a wheelhouse once:
+  $ pip download -r requirements.txt requests -d <wheelhouse>
+and then run with --wheelhouse <wheelhouse>.
 """
 
+import hashlib
 import os
 import platform
 import shutil
 import signal
 import subprocess
+import tempfile
+from datetime import date
 from pathlib import Path
-from time import sleep
+from time import monotonic, sleep
 
 import psutil
 import requests
 
 import utils
 from resources.ll_e2e_tests import run_e2e_test
+from resources.ll_load_tests import run_load_test
 from resources.migration_output import migration_output
 
 
@@ -31,19 +42,17 @@ def test_django_project(request, tmp_path, python_cmd):
     dest_dir = tmp_path / "learning_log"
     copy_to_temp_dir(dest_dir)
 
-    # All remaining work needs to be done in dest_dir.
-    os.chdir(dest_dir)
-
     # Process --django-version CLI arg.
     modify_requirements(request, dest_dir)
 
-    # Build a fresh venv for the project.
-    llenv_python_cmd = build_venv(python_cmd, dest_dir)
+    # Build a venv for the project, from a cached venv.
+    llenv_python_cmd = build_venv(request, python_cmd, dest_dir)
 
-    migrate_project(llenv_python_cmd)
-    check_project(llenv_python_cmd)
+    # All remaining commands run in dest_dir.
+    migrate_project(llenv_python_cmd, dest_dir)
+    check_project(llenv_python_cmd, dest_dir)
 
-    run_e2e_tests(dest_dir, llenv_python_cmd)
+    run_e2e_tests(request, dest_dir, llenv_python_cmd)
 
     # Show what versions of Python and Django were used.
     show_versions(llenv_python_cmd)
@@ -82,55 +91,157 @@ def modify_requirements(request, dest_dir):
     req_path.write_text(contents)
 
 
-def build_venv(python_cmd, dest_dir):
-    """Build a venv just for this test run."""
+def build_venv(request, python_cmd, dest_dir):
+    """Build a venv just for this test run.
+    Installing requirements is the slowest part of this test, so
+      packages are installed once into a cached venv. The venv for
+      this run is an empty venv that points at the cached venv's
+      site-packages through a .pth file.
+    """
+    cached_venv_dir = get_cached_venv(request, python_cmd, dest_dir)
+    cached_python_cmd = utils.get_venv_python_cmd(cached_venv_dir)
+    cached_site_packages = utils.get_site_packages(cached_python_cmd)
+
     print("\n***** Building venv for test...")
-    cmd = f"{python_cmd} -m venv ll_env"
-    output = utils.run_command(cmd)
+    cmd = f"{python_cmd} -m venv --without-pip ll_env"
+    output = utils.run_command(cmd, cwd=dest_dir)
     assert output == ""
 
-    # Get python command from ll_env.
-    llenv_python_cmd = (dest_dir
-            / "ll_env" / "bin" / "python")
-    if platform.system() == "Windows":
-        llenv_python_cmd = (dest_dir / "ll_env"
-            / "Scripts" / "python.exe").as_posix()
+    # Get python command from ll_env, and overlay the cached venv.
+    llenv_python_cmd = utils.get_venv_python_cmd(dest_dir / "ll_env")
+    site_packages = Path(utils.get_site_packages(llenv_python_cmd))
+    pth_path = site_packages / "ll_env_cache.pth"
+    pth_path.write_text(cached_site_packages + "\n")
 
-    # Run `pip freeze` to prove we're in a fresh venv.
+    # Run `pip freeze`, verify installations are visible in ll_env.
     cmd = f"{llenv_python_cmd} -m pip freeze"
     output = utils.run_command(cmd)
+    assert "Django==" in output
+    assert "django-bootstrap5==" in output
+    assert "platformshconfig==" in output
+    assert "requests==" in output
+
+    return llenv_python_cmd
+
+
+def get_cached_venv(request, python_cmd, dest_dir):
+    """Return the cached venv for this Python version and requirements.
+    The cache key is the Python version plus a hash of requirements.txt,
+      after --django-version has been applied. Each Django version
+      gets its own cached venv.
+
+    If any requirement isn't pinned, ie with --django-version unpinned,
+      the venv records the date it was built, and it's rebuilt in place
+      on the first run of a new day, so the latest releases are tested
+      without keeping a venv for every day.
+    """
+    python_version = utils.run_command(f"{python_cmd} --version")
+    req_path = dest_dir / "requirements.txt"
+    req_text = req_path.read_text()
+    req_hash = hashlib.sha256(req_text.encode()).hexdigest()[:16]
+    venv_name = python_version.lower().replace(" ", "-") + f"-{req_hash}"
+    unpinned = any("==" not in line for line in req_text.splitlines()
+        if line.strip())
+
+    cache_dir = get_venv_cache_dir(request)
+    cached_venv_dir = cache_dir / venv_name
+    build_date_path = cached_venv_dir / "build_date.txt"
+    today = date.today().isoformat()
+    if cached_venv_dir.exists():
+        if not unpinned or (build_date_path.exists()
+                and build_date_path.read_text() == today):
+            print(f"\n***** Using cached venv: {cached_venv_dir}")
+            return cached_venv_dir
+        print(f"\n***** Cached venv is out of date: {cached_venv_dir}")
+
+    # Build in a scratch dir, and move into place when finished, so an
+    #   interrupted build is never used, and parallel builds don't clash.
+    print(f"\n***** Building cached venv: {cached_venv_dir}")
+    build_dir = Path(tempfile.mkdtemp(dir=cache_dir, prefix="building-"))
+    try:
+        build_cached_venv(request, python_cmd, build_dir, req_path)
+        (build_dir / "build_date.txt").write_text(today)
+    except BaseException:
+        # Don't leave a failed or interrupted build in the cache.
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+    # Move an out-of-date venv aside, and remove it once the new one is
+    #   in place.
+    stale_dir = None
+    if cached_venv_dir.exists():
+        stale_dir = Path(tempfile.mkdtemp(dir=cache_dir, prefix="stale-"))
+        try:
+            cached_venv_dir.rename(stale_dir / venv_name)
+        except OSError:
+            # Another test process replaced it first.
+            pass
+
+    try:
+        build_dir.rename(cached_venv_dir)
+    except OSError:
+        # Another test process finished the same venv first.
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+    if stale_dir:
+        shutil.rmtree(stale_dir, ignore_errors=True)
+
+    return cached_venv_dir
+
+
+def build_cached_venv(request, python_cmd, build_dir, req_path):
+    """Build a venv in build_dir, with the requirements in req_path."""
+    cmd = f"{python_cmd} -m venv {build_dir.as_posix()}"
+    output = utils.run_command(cmd)
+    assert output == ""
+
+    # Run `pip freeze` to prove we're in a fresh venv.
+    build_python_cmd = utils.get_venv_python_cmd(build_dir)
+    cmd = f"{build_python_cmd} -m pip freeze"
+    output = utils.run_command(cmd)
     assert output == ""
 
     # Install requirements, and requests for testing.
-    cmd = f"{llenv_python_cmd} -m pip install -r requirements.txt"
+    pip_cmd = f"{build_python_cmd} -m pip install"
+    wheelhouse = request.config.getoption("--wheelhouse")
+    if wheelhouse:
+        wheelhouse = Path(wheelhouse).resolve().as_posix()
+        pip_cmd += f" --no-index --find-links {wheelhouse}"
+
+    cmd = f"{pip_cmd} -r {req_path.as_posix()}"
     output = utils.run_command(cmd)
-    cmd = f"{llenv_python_cmd} -m pip install requests"
+    cmd = f"{pip_cmd} requests"
     output = utils.run_command(cmd)
 
-    # Run `pip freeze` again, verify installations.
-    cmd = f"{llenv_python_cmd} -m pip freeze"
-    output = utils.run_command(cmd)
-    assert "Django==" in output
-    assert "django-bootstrap5==" in output
-    assert "platformshconfig==" in output
-    assert "requests==" in output
 
-    return llenv_python_cmd
+def get_venv_cache_dir(request):
+    """Return the dir where cached venvs are stored."""
+    cache_dir = request.config.getoption("--venv-cache-dir")
+    if not cache_dir and hasattr(request.config, "cache"):
+        return Path(request.config.cache.mkdir("ll_venvs"))
+
+    # The pytest cache is not available, ie with -p no:cacheprovider.
+    if not cache_dir:
+        cache_dir = Path(tempfile.gettempdir()) / "ll_venvs"
 
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
 
-def migrate_project(llenv_python_cmd):
+
+def migrate_project(llenv_python_cmd, dest_dir):
     cmd = f"{llenv_python_cmd} manage.py migrate"
-    output = utils.run_command(cmd)
+    output = utils.run_command(cmd, cwd=dest_dir)
     assert migration_output in output
 
 
-def check_project(llenv_python_cmd):
+def check_project(llenv_python_cmd, dest_dir):
     cmd = f"{llenv_python_cmd} manage.py check"
-    output = utils.run_command(cmd)
+    output = utils.run_command(cmd, cwd=dest_dir)
     assert "System check identified no issues (0 silenced)." in output
 
 
-def run_e2e_tests(dest_dir, llenv_python_cmd):
+def run_e2e_tests(request, dest_dir, llenv_python_cmd):
     """Run e2e tests against the running project.
     This has to start a dev server, keep it running through
       the e2e tests, then shut down the server. This needs
@@ -139,22 +250,38 @@ def run_e2e_tests(dest_dir, llenv_python_cmd):
     print("***** Running e2e tests...")
     # Log to file, so we can verify we haven't connected to a
     #   previous server process, or an unrelated one.
+    server_type = request.config.getoption("--ll-server")
     log_path = dest_dir / "runserver_log.txt"
-    server_process = start_server(llenv_python_cmd, log_path)
-    check_server_ready(log_path)
+    server_process = start_server(llenv_python_cmd, dest_dir, log_path,
+            server_type)
+    check_server_ready(log_path, server_type)
 
     # If e2e test is not run in a try block, a failed assertion will
     #   prevent the server from being terminated correctly.
     try:
         run_e2e_test("http://localhost:8008/")
+        run_load_tests(request, "http://localhost:8008/")
     except AssertionError as e:
         raise e
     finally:
         stop_server(server_process)
 
 
-def start_server(llenv_python_cmd, log_path):
-    """Start the dev server for e2e tests."""
+def run_load_tests(request, app_url):
+    """Run the load test, if --ll-load-clients was used."""
+    num_clients = request.config.getoption("--ll-load-clients")
+    if not num_clients:
+        return
+
+    latency_budget = request.config.getoption("--ll-latency-budget")
+    run_load_test(app_url, num_clients, latency_budget=latency_budget)
+
+
+def start_server(llenv_python_cmd, dest_dir, log_path, server_type):
+    """Start the dev server for e2e tests.
+    server_type "wsgi" serves the project with resources/wsgi_server.py,
+      which starts faster than runserver and runs in one process.
+    """
     print("***** Starting server...")
     # Start development server.
     #   To verify it's not running after the test:
@@ -166,47 +293,71 @@ def start_server(llenv_python_cmd, log_path):
     # I may have other projects running on 8000; run this on 8008.
     #   shell=True is necessary for redirecting output.
     #   start_new_session=True is required to terminate the process group.
-    cmd = f"{llenv_python_cmd} manage.py runserver 8008"
+    if server_type == "wsgi":
+        server_path = Path(__file__).parent / "resources" / "wsgi_server.py"
+        cmd = f"{llenv_python_cmd} -u {server_path.as_posix()} 8008"
+    else:
+        cmd = f"{llenv_python_cmd} manage.py runserver 8008"
     cmd += f" > {log_path} 2>&1"
-    server_process = subprocess.Popen(cmd, shell=True,
+    server_process = subprocess.Popen(cmd, shell=True, cwd=dest_dir,
             start_new_session=True)
 
     print(f"*****   PID: {server_process.pid}")
     return server_process
 
 
-def check_server_ready(log_path):
+def check_server_ready(log_path, server_type):
     """Verify that the server is ready to use.
-    Issue requests until we get a correct response.
+    Poll the home page, backing off between attempts, until we get a
+      correct response.
     Verify the response is from the server we just started,
       not some other server.
     """
     print("***** Checking server...")
     # Wait until server is ready.
     url = "http://localhost:8008/"
-    connected = False
-    attempts, max_attempts = 1, 50
-    while attempts < max_attempts:
-        try:
-            r = requests.get(url)
-            if r.status_code == 200:
-                connected = True
-                break
-        except requests.ConnectionError:
-            attempts += 1
-            sleep(0.2)
+    with requests.Session() as s:
+        connected = wait_for(lambda: home_page_ok(s, url), timeout=20)
 
     # Verify connection.
     assert connected
 
     # Verify connection was made to *this* server, not
     #   a previous test run, or some other server on 8008.
-    # Pause for log file to be written.
-    sleep(1)
+    # Wait for the request to be written to the log file.
+    log_written = wait_for(
+        lambda: '"GET / HTTP/1.1" 200' in log_path.read_text(),
+        timeout=5)
     log_text = log_path.read_text()
+    assert log_written
     assert "Error: That port is already in use" not in log_text
-    assert "Watching for file changes with StatReloader" in log_text
-    assert '"GET / HTTP/1.1" 200' in log_text
+    if server_type == "wsgi":
+        assert "Serving Learning Log with wsgiref on port 8008" in log_text
+    else:
+        assert "Watching for file changes with StatReloader" in log_text
+
+
+def home_page_ok(session, url):
+    """Return True if the home page loads."""
+    try:
+        return session.get(url).status_code == 200
+    except requests.ConnectionError:
+        return False
+
+
+def wait_for(condition, timeout, first_delay=0.01, max_delay=0.5):
+    """Call condition() until it returns True, with exponential backoff.
+    Returns False if timeout seconds pass first.
+    """
+    deadline = monotonic() + timeout
+    delay = first_delay
+    while True:
+        if condition():
+            return True
+        if monotonic() > deadline:
+            return False
+        sleep(delay)
+        delay = min(delay * 2, max_delay)
 
 
 def stop_server(server_process):
@@ -5,17 +5,19 @@ Chapter 16: Weather plots
 
 Overall approach:
 - Copy code to a tmp dir.
-- Modify code to call savefig() instead of plt.show().
-- Compare output files against reference files.
+- Modify code to call savefig() instead of plt.show(), with instrument.py.
+- Compare output files against snapshots, keyed by Matplotlib version.
 
 """
 
 from pathlib import Path
-import shutil, os, filecmp
+import os, shutil
 
 import pytest
+import numpy as np
 
 import utils
+from instrument import instrument_file
 
 
 @pytest.fixture(scope="module", autouse=True)
@@ -23,6 +25,12 @@ def check_matplotlib_version(request, python_cmd):
     """Check if the correct version of Matplotlib is installed."""
     utils.check_library_version(request, python_cmd, "matplotlib")
 
+@pytest.fixture(scope="module")
+def matplotlib_version(check_matplotlib_version, python_cmd):
+    """Return the installed Matplotlib version, as a snapshot version."""
+    versions = utils.get_installed_versions(python_cmd, "matplotlib")
+    return f"matplotlib-{versions[0]}"
+
 
 simple_plots = [
     "chapter_15/plotting_simple_line_graph/mpl_squares.py",
@@ -30,45 +38,38 @@ simple_plots = [
 ]
 
 @pytest.mark.parametrize("test_file", simple_plots)
-def test_simple_plots(tmp_path, python_cmd, test_file):
+def test_simple_plots(tmp_path, python_cmd, snapshots, matplotlib_version,
+        test_file):
     # Copy program file to temp dir.
     src_path = Path(__file__).parents[1] / test_file
 
     dest_path = tmp_path / src_path.name
-    shutil.copy(src_path, dest_path)
 
     # Replace plt.show() with savefig().
-    contents = dest_path.read_text()
-    save_cmd = 'plt.savefig("output_file.png", metadata={"Software": ""})'
-    contents = contents.replace("plt.show()", save_cmd)
+    instrument_file(src_path, dest_path, savefig_name="output_file.png")
 
     # Uncomment this to verify that comparison
     #   fails for an incorrect plot image:
-    # contents = contents.replace("16", "32")
-
-    dest_path.write_text(contents)
+    # dest_path.write_text(dest_path.read_text().replace("16", "32"))
 
     # Run program from tmp path dir.
-    os.chdir(tmp_path)
     cmd = f"{python_cmd} {dest_path.name}"
-    output = utils.run_command(cmd)
+    output = utils.run_command(cmd, cwd=tmp_path)
 
-    # Verify file was created, and that it matches reference file.
+    # Verify file was created, and that it matches the snapshot.
     output_path = tmp_path / "output_file.png"
     assert output_path.exists()
 
     # Print output file path, so it's easy to find images.
     print("\n***** mpl_squares output:", output_path)
 
-    reference_filename = src_path.name.replace(".py", ".png")
-    reference_file_path = (Path(__file__).parent
-            / "reference_files" / reference_filename)
-    assert filecmp.cmp(output_path, reference_file_path)
+    snapshots.check_file(test_file, output_path, matplotlib_version)
 
     # Verify text output.
     assert output == ""
 
-def test_random_walk_program(tmp_path, python_cmd):
+def test_random_walk_program(tmp_path, python_cmd, snapshots,
+        matplotlib_version):
     # Copy rw_visual.py and random_walk.py.
     path_rwv = (Path(__file__).parents[1] /
         "chapter_15" / "random_walks" / "rw_visual.py")
@@ -77,46 +78,162 @@ def test_random_walk_program(tmp_path, python_cmd):
     dest_path_rwv = tmp_path / path_rwv.name
     dest_path_rw = tmp_path / path_rw.name
 
-    shutil.copy(path_rwv, dest_path_rwv)
     shutil.copy(path_rw, dest_path_rw)
 
-    # Modify rw_visual.py for testing.
-    lines = dest_path_rwv.read_text().splitlines()[:26]
-
-    # Remove while line.
-    del lines[4:6]
-    # Unindent remaining lines.
-    lines = [line.lstrip() for line in lines]
-    # Add command to write image file.
-    save_cmd = '\nplt.savefig("output_file.png", metadata={"Software": ""})'
-    lines.append(save_cmd)
-    # Add lines to seed random number generator.
-    lines.insert(0, "import random")
-    lines.insert(4, "\nrandom.seed(23)")
-
-    # Write modified rw_visual.py.
-    contents = "\n".join(lines)
-    dest_path_rwv.write_text(contents)
+    # Modify rw_visual.py for testing: make one walk instead of looping,
+    #   write an image file, and seed the random number generator.
+    instrument_file(path_rwv, dest_path_rwv, savefig_name="output_file.png",
+        seed=23, unroll_while_true=True)
 
     # Run the file.
-    os.chdir(tmp_path)
     cmd = f"{python_cmd} {dest_path_rwv.name}"
-    output = utils.run_command(cmd)
+    output = utils.run_command(cmd, cwd=tmp_path)
 
-    # Verify file was created, and that it matches reference file.
+    # Verify file was created, and that it matches the snapshot.
     output_path = tmp_path / "output_file.png"
     assert output_path.exists()
 
     # Print output file path, so it"s easy to find images.
     print("\n***** rw_visual output:", output_path)
 
-    reference_file_path = (Path(__file__).parent /
-        "reference_files" / "rw_visual.png")
-    assert filecmp.cmp(output_path, reference_file_path)
+    snapshots.check_file("chapter_15/random_walks/rw_visual.py", output_path,
+        matplotlib_version)
 
     # Verify text output.
     assert output == ""
 
+def test_numpy_random_walk(chapter_path):
+    """Check the NumPy walk in-process; it doesn't have a visual program."""
+    chapter_path("chapter_15/random_walks")
+    from random_walk_numpy import NumpyRandomWalk
+
+    rw = NumpyRandomWalk(50_000, seed=23)
+    rw.fill_walk()
+
+    assert len(rw.x_values) == len(rw.y_values) == 50_000
+    assert rw.x_values.dtype == rw.y_values.dtype == np.int32
+    assert rw.x_values[0] == rw.y_values[0] == 0
+
+    # Every step moves, and no step is longer than 4 in either direction.
+    x_steps, y_steps = np.diff(rw.x_values), np.diff(rw.y_values)
+    assert not ((x_steps == 0) & (y_steps == 0)).any()
+    assert np.abs(x_steps).max() <= 4 and np.abs(y_steps).max() <= 4
+
+    # The same seed makes the same walk.
+    rw_2 = NumpyRandomWalk(50_000, seed=23)
+    rw_2.fill_walk()
+    assert np.array_equal(rw.x_values, rw_2.x_values)
+    assert np.array_equal(rw.y_values, rw_2.y_values)
+
+    # Like RandomWalk, a walk of 0 or 1 points is just its starting point.
+    for num_points in (0, 1):
+        rw = NumpyRandomWalk(num_points, seed=23)
+        rw.fill_walk()
+        assert list(rw.x_values) == list(rw.y_values) == [0]
+        assert rw.get_stats().num_points == 1
+
+    with pytest.raises(ValueError, match="num_points"):
+        NumpyRandomWalk(-1)
+
+def test_streaming_random_walk(tmp_path, chapter_path):
+    """Write a walk in chunks, and check it against its running stats."""
+    chapter_path("chapter_15/random_walks")
+    from random_walk_numpy import NumpyRandomWalk
+
+    # One chunk makes the same walk as fill_walk().
+    rw = NumpyRandomWalk(10_000, seed=23)
+    rw.fill_walk()
+    x_values, y_values = next(
+        NumpyRandomWalk(10_000, seed=23).iter_chunks(10_000))
+    assert np.array_equal(rw.x_values, x_values)
+    assert np.array_equal(rw.y_values, y_values)
+
+    # Small chunks, so the walk crosses several chunk boundaries.
+    path = tmp_path / "walk.npy"
+    stats = NumpyRandomWalk(100_000, seed=23).write_npy(path, chunk_size=7_000)
+    points = np.load(path, mmap_mode="r")
+    x_values, y_values = points
+
+    assert points.shape == (2, 100_000)
+    assert x_values[0] == y_values[0] == 0
+    x_steps, y_steps = np.diff(x_values), np.diff(y_values)
+    assert not ((x_steps == 0) & (y_steps == 0)).any()
+    assert np.abs(x_steps).max() <= 4 and np.abs(y_steps).max() <= 4
+
+    assert stats.num_points == 100_000
+    assert (stats.min_x, stats.max_x) == (x_values.min(), x_values.max())
+    assert (stats.min_y, stats.max_y) == (y_values.min(), y_values.max())
+    assert (stats.final_x, stats.final_y) == (x_values[-1], y_values[-1])
+    distances = np.hypot(x_values, y_values)
+    assert stats.max_distance == pytest.approx(distances.max())
+
+    # Walks that could overflow int32 use int64.
+    assert NumpyRandomWalk(1_000_000_000).get_dtype() == np.int64
+
+def test_random_walk_ensemble(chapter_path):
+    """Results depend on the seed, not on the number of workers."""
+    chapter_path("chapter_15/random_walks")
+    from rw_ensemble import simulate_ensemble
+
+    result = simulate_ensemble(200, 1_000, seed=23, num_workers=2)
+    result_2 = simulate_ensemble(200, 1_000, seed=23, num_workers=1)
+
+    assert result.msd.shape == (1_000,)
+    assert result.end_points.shape == (200, 2)
+    assert np.array_equal(result.msd, result_2.msd)
+    assert np.array_equal(result.end_points, result_2.end_points)
+
+    # Each step adds 12.5 to the squared displacement, on average:
+    #   E[x^2 + y^2] is 12 for a step, and 1 in 25 steps is redrawn.
+    assert result.msd[0] == 0
+    assert result.msd[-1] / 999 == pytest.approx(12.5, rel=0.15)
+
+    # Bad arguments are named, instead of failing in the pool.
+    for kwargs, name in [({'num_walks': 0}, 'num_walks'),
+            ({'num_points': 0}, 'num_points'),
+            ({'num_workers': 0}, 'num_workers')]:
+        args = {'num_walks': 10, 'num_points': 100, **kwargs}
+        with pytest.raises(ValueError, match=name):
+            simulate_ensemble(**args)
+
+def test_random_walk_density_program(tmp_path, python_cmd):
+    """Run rw_density_visual.py; the image isn't compared, because it
+    depends on NumPy's random number generator.
+    """
+    rw_dir = Path(__file__).parents[1] / "chapter_15" / "random_walks"
+    for filename in ["random_walk.py", "random_walk_numpy.py",
+            "rw_density.py"]:
+        shutil.copy(rw_dir / filename, tmp_path / filename)
+
+    path_rwdv = rw_dir / "rw_density_visual.py"
+    dest_path_rwdv = tmp_path / path_rwdv.name
+    instrument_file(path_rwdv, dest_path_rwdv, savefig_name="output_file.png",
+        unroll_while_true=True)
+
+    cmd = f"{python_cmd} {dest_path_rwdv.name}"
+    output = utils.run_command(cmd, cwd=tmp_path)
+
+    output_path = tmp_path / "output_file.png"
+    assert output_path.exists()
+    print("\n***** rw_density_visual output:", output_path)
+    assert output == ""
+
+def test_density_image(chapter_path):
+    chapter_path("chapter_15/random_walks")
+    from rw_density import get_density_image
+
+    # Points 0 and 2 share a pixel, point 1 has its own, and the
+    #   other two pixels are never visited.
+    x_values = np.array([0, 3, 0])
+    y_values = np.array([0, 3, 1])
+    image, extent = get_density_image(x_values, y_values, bins=2)
+
+    assert image.shape == (2, 2)
+    assert extent == (0, 4, 0, 4)
+    assert image[0, 0] == 1.0
+    assert image[1, 1] == 1.0
+    assert np.isnan(image[0, 1]) and np.isnan(image[1, 0])
+
 weather_programs = [
     ("sitka_highs.py", "sitka_weather_2021_simple.csv", ""),
     ("sitka_highs_lows.py", "sitka_weather_2021_simple.csv", ""),
@@ -125,48 +242,367 @@ weather_programs = [
 
 @pytest.mark.parametrize("test_file, data_file, txt_output",
     weather_programs)
-def test_weather_program(tmp_path, python_cmd, 
-        test_file, data_file, txt_output):
+def test_weather_program(tmp_path, python_cmd, shared_data_dir, snapshots,
+        matplotlib_version, test_file, data_file, txt_output):
 
     # Make a weather_data/ dir in tmp dir.
     dest_data_dir = tmp_path / "weather_data"
     dest_data_dir.mkdir()
 
-    # Copy files to tmp dir.
+    # Link data file into tmp dir, from the shared read-only copy.
     path_py = (Path(__file__).parents[1] /
         "chapter_16"/ "the_csv_file_format" / test_file)
-    path_data = path_py.parent / "weather_data" / data_file
+    path_data = shared_data_dir / "weather_data" / data_file
 
     dest_path_py = tmp_path / path_py.name
-    dest_path_data = (dest_path_py.parent /
-            "weather_data" / path_data.name)
+    dest_path_data = dest_data_dir / path_data.name
 
-    shutil.copy(path_py, dest_path_py)
-    shutil.copy(path_data, dest_path_data)
+    utils.link_file(path_data, dest_path_data)
 
     # Write images instead of calling plt.show().
-    contents = dest_path_py.read_text()
-    save_cmd = 'plt.savefig("output_file.png", metadata={"Software": ""})'
-    contents = contents.replace("plt.show()", save_cmd)
-    dest_path_py.write_text(contents)
+    instrument_file(path_py, dest_path_py, savefig_name="output_file.png")
 
     # Run program.
-    os.chdir(tmp_path)
     cmd = f"{python_cmd} {dest_path_py.name}"
-    output = utils.run_command(cmd)
+    output = utils.run_command(cmd, cwd=tmp_path)
 
-    # Verify file was created, and that it matches reference file.
+    # Verify file was created.
     output_path = tmp_path / "output_file.png"
     assert output_path.exists()
 
     # Print output file path, so it's easy to find images.
     print(f"\n***** {dest_path_py.name} output:", output_path)
 
-    # Check output image against reference file.
-    reference_filename = dest_path_py.name.replace(".py", ".png")
-    reference_file_path = (Path(__file__).parent
-            / "reference_files" / reference_filename)
-    assert filecmp.cmp(output_path, reference_file_path)
+    # Check output image against the snapshot.
+    snapshots.check_file(f"chapter_16/the_csv_file_format/{test_file}",
+        output_path, matplotlib_version)
 
     # Verify text output.
-    assert output == txt_output
\ No newline at end of file
+    assert output == txt_output
+
+@pytest.mark.parametrize("data_file", ["sitka_weather_2021_full.csv",
+    "death_valley_2021_simple.csv", "sitka_weather_07-2021_simple.csv"])
+def test_weather_loader(chapter_path, shared_data_dir, weather_frames,
+        data_file):
+    """The loader should agree with pandas, for every column."""
+    chapter_path("chapter_16/the_csv_file_format")
+    from weather_loader import load_weather_data
+
+    path = shared_data_dir / "weather_data" / data_file
+    weather_data = load_weather_data(path)
+    frame = weather_frames[data_file]
+
+    assert len(weather_data) == len(frame)
+    assert weather_data.dates.dtype == np.dtype("datetime64[D]")
+    assert np.array_equal(weather_data.dates,
+        frame["DATE"].to_numpy().astype("datetime64[D]"))
+    assert weather_data.place_name == frame["NAME"][0]
+
+    for name in ["TMAX", "TMIN"]:
+        column = weather_data[name]
+        assert np.array_equal(np.ma.getmaskarray(column),
+            frame[name].isna().to_numpy())
+        assert np.array_equal(column.compressed(),
+            frame[name].dropna().to_numpy())
+
+    # Only the requested columns are loaded, plus NAME.
+    weather_data = load_weather_data(path, ["TMAX"])
+    assert list(weather_data.columns) == ["TMAX", "NAME"]
+
+    with pytest.raises(ValueError):
+        load_weather_data(path, ["SNOWFALL"])
+
+# A NOAA export with flag columns, and a column of codes.
+attributes_csv = """\
+"STATION","NAME","DATE","PRCP","PRCP_ATTRIBUTES","TMAX","TMAX_ATTRIBUTES","WT01"
+"US1","TEST, AK US","2021-01-01","0.10",",,W,2400","40",",,W",
+"US1","TEST, AK US","2021-01-02",,,"41",",,W","X"
+"""
+
+def test_weather_loader_attributes(tmp_path, chapter_path):
+    """Attribute columns, and columns that aren't numeric, are text."""
+    chapter_path("chapter_16/the_csv_file_format")
+    from weather_loader import load_weather_data
+
+    path = tmp_path / "attributes.csv"
+    path.write_text(attributes_csv)
+    weather_data = load_weather_data(path)
+
+    assert weather_data["PRCP_ATTRIBUTES"].tolist() == [",,W,2400", ""]
+    assert weather_data["TMAX_ATTRIBUTES"].tolist() == [",,W", ",,W"]
+    assert weather_data["WT01"].tolist() == ["", "X"]
+    assert not isinstance(weather_data["WT01"], np.ma.MaskedArray)
+
+    assert weather_data["PRCP"].mask.tolist() == [False, True]
+    assert weather_data["TMAX"].tolist() == [40, 41]
+
+def test_weather_cache(tmp_path, chapter_path, shared_data_dir):
+    """Cached columns match parsed columns, and follow changes to the file."""
+    chapter_path("chapter_16/the_csv_file_format")
+    import weather_loader
+
+    # Copy the data file, because this test modifies it.
+    path = tmp_path / "death_valley_2021_simple.csv"
+    shutil.copy(shared_data_dir / "weather_data" / path.name, path)
+    path.chmod(0o644)
+
+    parsed = weather_loader.load_weather_data(path)
+    weather_loader.load_weather_data(path, cache=True)
+    cached = weather_loader.load_weather_data(path, cache=True)
+
+    cache_dir = tmp_path / ".weather_cache" / path.name
+    assert (cache_dir / "cache_info.json").exists()
+    assert isinstance(cached["TMAX"].data, np.memmap)
+    assert np.array_equal(cached.dates, parsed.dates)
+    assert cached.place_name == parsed.place_name
+    for name in ["TMAX", "TMIN", "TOBS"]:
+        assert np.array_equal(np.ma.getmaskarray(cached[name]),
+            np.ma.getmaskarray(parsed[name]))
+        assert np.array_equal(cached[name].compressed(),
+            parsed[name].compressed())
+
+    # Touching the file doesn't rebuild the cache.
+    dates_mtime = (cache_dir / "DATE.npy").stat().st_mtime_ns
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    weather_loader.load_weather_data(path, cache=True)
+    assert (cache_dir / "DATE.npy").stat().st_mtime_ns == dates_mtime
+
+    # Changing the file does.
+    contents = path.read_text().replace('"2021-01-01","71"',
+        '"2021-01-01","99"')
+    path.write_text(contents)
+    cached = weather_loader.load_weather_data(path, ["TMAX"], cache=True)
+    assert cached["TMAX"][0] == 99
+
+def test_weather_cache_attributes(tmp_path, chapter_path):
+    """Files with attribute columns can be cached, and text columns come
+    back as plain strings.
+    """
+    chapter_path("chapter_16/the_csv_file_format")
+    from weather_loader import load_weather_data
+
+    path = tmp_path / "attributes.csv"
+    path.write_text(attributes_csv)
+
+    cached = load_weather_data(path, ["TMAX"], cache=True)
+    assert cached["TMAX"].tolist() == [40, 41]
+
+    cached = load_weather_data(path, cache=True)
+    parsed = load_weather_data(path)
+    assert list(cached.columns) == list(parsed.columns)
+    for name, values in parsed.columns.items():
+        assert (isinstance(cached[name], np.ma.MaskedArray)
+            == isinstance(values, np.ma.MaskedArray))
+        assert cached[name].tolist() == values.tolist()
+
+def test_station_table(chapter_path, shared_data_dir, weather_frames):
+    """Aggregates for every station should agree with pandas."""
+    chapter_path("chapter_16/the_csv_file_format")
+    from weather_stations import load_station_table
+
+    table = load_station_table(shared_data_dir / "weather_data",
+        column="TMAX", num_workers=2)
+    assert len(table) == 2
+    assert table.values.shape == (2, 365)
+
+    rolling_means = table.get_rolling_means(7)
+    monthly_means = table.get_monthly_means()
+    for station_num, station in enumerate(table.stations):
+        data_file = {"USC00042319": "death_valley_2021_full.csv",
+            "USW00025333": "sitka_weather_2021_full.csv"}[station]
+        frame = weather_frames[data_file]
+
+        assert table.names[station_num] == frame["NAME"][0]
+        assert np.allclose(table.values[station_num].filled(np.nan),
+            frame["TMAX"], equal_nan=True)
+        assert np.allclose(rolling_means[station_num].filled(np.nan),
+            frame["TMAX"].rolling(7, min_periods=1).mean(), equal_nan=True)
+        assert np.allclose(monthly_means[station_num],
+            frame.groupby(frame["DATE"].dt.month)["TMAX"].mean())
+
+    # Summer is hotter than winter, at both stations.
+    seasonal_means = table.get_seasonal_means()
+    assert seasonal_means.shape == (2, 4)
+    assert (seasonal_means[:, 2] > seasonal_means[:, 0]).all()
+
+def test_station_table_split_files(chapter_path, shared_data_dir):
+    """A station that's split across files should get one row."""
+    chapter_path("chapter_16/the_csv_file_format")
+    from weather_live import select_rows
+    from weather_stations import build_station_table, load_station_columns
+
+    path = shared_data_dir / "weather_data" / "sitka_weather_2021_full.csv"
+    weather_data = load_station_columns(path, "TMAX")
+    first_half = np.arange(len(weather_data)) < 180
+    halves = [select_rows(weather_data, first_half),
+        select_rows(weather_data, ~first_half)]
+
+    table = build_station_table(halves, "TMAX")
+    assert list(table.stations) == ["USW00025333"]
+    assert table.values.shape == (1, 365)
+    assert np.allclose(table.values[0].filled(np.nan),
+        weather_data["TMAX"].filled(np.nan), equal_nan=True)
+
+def test_station_comparison_program(tmp_path, python_cmd, shared_data_dir):
+    """Run station_comparison.py, which loads every *_full.csv file."""
+    weather_dir = (Path(__file__).parents[1] / "chapter_16"
+        / "the_csv_file_format")
+    for filename in ["weather_loader.py", "weather_stations.py"]:
+        shutil.copy(weather_dir / filename, tmp_path / filename)
+
+    dest_data_dir = tmp_path / "weather_data"
+    dest_data_dir.mkdir()
+    for path_data in (shared_data_dir / "weather_data").glob("*_full.csv"):
+        utils.link_file(path_data, dest_data_dir / path_data.name)
+
+    path_py = weather_dir / "station_comparison.py"
+    instrument_file(path_py, tmp_path / path_py.name,
+        savefig_name="output_file.png")
+
+    cmd = f"{python_cmd} {path_py.name}"
+    output = utils.run_command(cmd, cwd=tmp_path)
+
+    output_path = tmp_path / "output_file.png"
+    assert output_path.exists()
+    print("\n***** station_comparison output:", output_path)
+    assert output == ""
+
+def test_weather_missing_data(chapter_path, shared_data_dir):
+    chapter_path("chapter_16/the_csv_file_format")
+    from weather_loader import load_weather_data
+
+    path = shared_data_dir / "weather_data" / "death_valley_2021_full.csv"
+    weather_data = load_weather_data(path)
+
+    # The opt-in report matches what death_valley_highs_lows.py prints.
+    assert weather_data.report_missing(["TMAX", "TMIN"]) == [
+        "Missing data for 2021-05-04 00:00:00"]
+
+    # Gaps are runs of missing rows, in any of the named columns.
+    assert weather_data.get_gaps(["TOBS"])[0] == (
+        np.datetime64("2021-02-22"), np.datetime64("2021-02-22"), 1)
+    assert weather_data.summarize_missing(["TMAX", "TMIN"]) == (
+        "Missing TMAX or TMIN data for 1 day, in 1 gap: 2021-05-04")
+    assert weather_data.summarize_missing(["PRCP"]).startswith("No missing")
+
+    # Each way of plotting gaps.
+    missing = weather_data.get_missing_mask(["TMAX"])
+    dates, (highs,) = weather_data.get_plot_values(["TMAX"], gaps="break")
+    assert len(dates) == 365 and np.isnan(highs[missing]).all()
+    dates, (highs,) = weather_data.get_plot_values(["TMAX"],
+        gaps="interpolate")
+    day_num = np.flatnonzero(missing)[0]
+    assert highs[day_num] == (highs[day_num-1] + highs[day_num+1]) / 2
+
+    # TMAX and TOBS are missing on different days; dropping leaves out
+    #   those days from both columns.
+    missing = weather_data.get_missing_mask(["TMAX", "TOBS"])
+    assert missing.sum() > weather_data.get_missing_mask(["TOBS"]).sum()
+    dates, (highs, obs) = weather_data.get_plot_values(["TMAX", "TOBS"],
+        gaps="drop")
+    assert np.array_equal(dates, weather_data.dates[~missing])
+    assert len(highs) == len(obs) == len(dates)
+    assert not (np.isnan(highs).any() or np.isnan(obs).any())
+
+    with pytest.raises(ValueError):
+        weather_data.get_plot_values(["TMAX"], gaps="skip")
+
+def test_death_valley_gaps_program(tmp_path, python_cmd, shared_data_dir):
+    """Run death_valley_gaps.py, which prints a summary of missing data."""
+    weather_dir = (Path(__file__).parents[1] / "chapter_16"
+        / "the_csv_file_format")
+    shutil.copy(weather_dir / "weather_loader.py", tmp_path)
+
+    dest_data_dir = tmp_path / "weather_data"
+    dest_data_dir.mkdir()
+    path_data = (shared_data_dir / "weather_data"
+        / "death_valley_2021_simple.csv")
+    utils.link_file(path_data, dest_data_dir / path_data.name)
+
+    path_py = weather_dir / "death_valley_gaps.py"
+    instrument_file(path_py, tmp_path / path_py.name,
+        savefig_name="output_file.png")
+
+    cmd = f"{python_cmd} {path_py.name}"
+    output = utils.run_command(cmd, cwd=tmp_path)
+
+    output_path = tmp_path / "output_file.png"
+    assert output_path.exists()
+    print("\n***** death_valley_gaps output:", output_path)
+    assert output == (
+        "Missing TMAX or TMIN data for 1 day, in 1 gap: 2021-05-04")
+
+def test_live_weather_plot(tmp_path, chapter_path, shared_data_dir):
+    """Rows appended to a file are read on their own, and the plot's
+    artists are updated in place.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    chapter_path("chapter_16/the_csv_file_format")
+    from weather_loader import load_weather_data
+    from weather_live import WeatherFollower, LiveWeatherPlot
+
+    # Start with the first 120 days, and the start of the next row.
+    src_path = (shared_data_dir / "weather_data"
+        / "death_valley_2021_simple.csv")
+    lines = src_path.read_bytes().splitlines(keepends=True)
+    path = tmp_path / src_path.name
+    path.write_bytes(b"".join(lines[:121]) + lines[121][:20])
+
+    follower = WeatherFollower(path)
+    fig, ax = plt.subplots()
+    live_plot = LiveWeatherPlot(ax, follower)
+    fill = live_plot.fill
+    assert len(live_plot.high_line.get_xdata()) == 120
+    assert follower.last_date == np.datetime64("2021-04-30")
+
+    # No complete rows yet, so nothing changes.
+    assert live_plot.update() == []
+
+    # Finish the partial row, and add the rest, after repeating a day
+    #   that's already been read.
+    with path.open("ab") as f:
+        f.write(lines[121][20:] + lines[120] + b"".join(lines[122:]))
+
+    # The plot catches up, keeping the same artists.
+    assert live_plot.update() == [live_plot.high_line, live_plot.low_line,
+        fill]
+    assert live_plot.fill is fill
+    assert follower.last_date == np.datetime64("2021-12-31")
+
+    full_data = load_weather_data(src_path, ["TMAX", "TMIN"])
+    assert np.array_equal(follower.weather_data.dates, full_data.dates)
+    assert np.allclose(live_plot.high_line.get_ydata(),
+        full_data["TMAX"].filled(np.nan), equal_nan=True)
+
+    # The missing day on 2021-05-04 splits the filled area in two.
+    assert len(fill.get_paths()) == 2
+    plt.close(fig)
+
+def test_sitka_live_program(tmp_path, python_cmd, shared_data_dir):
+    """Run sitka_live.py; the animation isn't run, only its first frame."""
+    weather_dir = (Path(__file__).parents[1] / "chapter_16"
+        / "the_csv_file_format")
+    for filename in ["weather_loader.py", "weather_live.py"]:
+        shutil.copy(weather_dir / filename, tmp_path / filename)
+
+    dest_data_dir = tmp_path / "weather_data"
+    dest_data_dir.mkdir()
+    path_data = (shared_data_dir / "weather_data"
+        / "sitka_weather_2021_simple.csv")
+    utils.link_file(path_data, dest_data_dir / path_data.name)
+
+    path_py = weather_dir / "sitka_live.py"
+    instrument_file(path_py, tmp_path / path_py.name,
+        savefig_name="output_file.png")
+
+    cmd = f"{python_cmd} {path_py.name}"
+    output = utils.run_command(cmd, cwd=tmp_path)
+
+    output_path = tmp_path / "output_file.png"
+    assert output_path.exists()
+    print("\n***** sitka_live output:", output_path)
+    assert output == ""
@@ -6,8 +6,9 @@ Chapter 17: Python repos?
 
 Overall approach:
 - Copy code to a tmp dir.
-- Modify code to save html file instead of opening tmp file in browser.
-- Compare output files against reference files.
+- Modify code to save html file instead of opening tmp file in browser,
+  with instrument.py.
+- Compare output files against snapshots, keyed by Plotly version.
 
 Notes:
 - Need to call write_html() and generate full file, because that's what users see.
@@ -26,13 +27,15 @@ Notes:
 """
 
 from pathlib import Path
-import os, shutil, filecmp, re
+from fractions import Fraction
+import json, shutil, re
 
 import pytest
 from PIL import Image
 import numpy as np
 
 import utils
+from instrument import instrument_file
 
 
 @pytest.fixture(scope="module", autouse=True)
@@ -40,6 +43,12 @@ def check_plotly_version(request, python_cmd):
     """Check if the correct version of Plotly is installed."""
     utils.check_library_version(request, python_cmd, "plotly")
 
+@pytest.fixture(scope="module")
+def plotly_version(check_plotly_version, python_cmd):
+    """Return the installed Plotly version, as a snapshot version."""
+    versions = utils.get_installed_versions(python_cmd, "plotly")
+    return f"plotly-{versions[0]}"
+
 
 die_programs = [
     "chapter_15/rolling_dice/die_visual.py",
@@ -48,36 +57,26 @@ die_programs = [
 ]
 
 @pytest.mark.parametrize("test_file", die_programs)
-def test_die_program(tmp_path, python_cmd, test_file):
+def test_die_program(tmp_path, python_cmd, snapshots, plotly_version,
+        test_file):
 
     # Copy program file to temp dir.
     path = Path(__file__).parents[1] / test_file
     dest_path = tmp_path / path.name
-    shutil.copy(path, dest_path)
 
     # Copy die.py to temp dir.
     path_die = path.parent / "die.py"
     dest_path_die = tmp_path / "die.py"
     shutil.copy(path_die, dest_path_die)
 
-    # Modify the program file for testing.
-    # Read all lines except fig.show().
-    lines = dest_path.read_text().splitlines()[:-1]
-
-    # Set random seed.
-    lines.insert(0, "import random")
-    lines.insert(5, "random.seed(23)")
-
-    # Write HTML with and without plotly.js.
-    lines = utils.add_plotly_write_commands(path, lines)
-
-    contents = "\n".join(lines)
-    dest_path.write_text(contents)
+    # Modify the program file for testing: set random seed, and
+    #   write HTML with and without plotly.js instead of calling fig.show().
+    html_name = path.name.replace(".py", ".html")
+    instrument_file(path, dest_path, html_name=html_name, seed=23)
 
     # Run the program.
-    os.chdir(tmp_path)
     cmd = f"{python_cmd} {path.name}"
-    output = utils.run_command(cmd)
+    output = utils.run_command(cmd, cwd=tmp_path)
 
     # Verify the output file exists.
     output_filename = path.name.replace(".py", "_nojs.html")
@@ -89,18 +88,125 @@ def test_die_program(tmp_path, python_cmd, test_file):
     # Print output file path, so it's easy to find.
     print("\n***** Plotly output:", output_path)
 
-    reference_file_path = (Path(__file__).parent /
-        "reference_files" / output_filename)
-    assert filecmp.cmp(output_path, reference_file_path)
+    snapshots.check_file(test_file, output_path, plotly_version)
+
+
+def test_dice_set(chapter_path):
+    """Check bulk rolling with NumPy, for a D6 and a D10."""
+    chapter_path("chapter_15/rolling_dice")
+    from die import Die
+    from dice_numpy import DiceSet
+
+    dice = DiceSet([Die(), Die(10)], seed=23)
+    assert dice.poss_results == range(2, 17)
+
+    results = dice.roll(50_000)
+    assert results.min() == 2 and results.max() == 16
+    same_dice = DiceSet([Die(), Die(10)], seed=23)
+    assert np.array_equal(results, same_dice.roll(50_000))
+
+    # Small chunks, so the counts are added up across chunks.
+    frequencies = dice.get_frequencies(50_003, chunk_size=1_000)
+    assert len(frequencies) == 15
+    assert frequencies.sum() == 50_003
+
+    # Results from 7 through 11 are each 6 times as likely as 2 or 16.
+    assert frequencies[5:10].min() > 4 * max(frequencies[0], frequencies[-1])
+
+
+def test_dice_pmf(chapter_path):
+    """Check exact distributions, against counts from Fraction arithmetic."""
+    chapter_path("chapter_15/rolling_dice")
+    from die import Die
+    import dice_pmf
+
+    poss_results, probabilities = dice_pmf.get_pmf([Die(), Die()])
+    assert poss_results == range(2, 13)
+    assert np.allclose(probabilities * 36, [1, 2, 3, 4, 5, 6, 5, 4, 3, 2, 1])
+    assert not probabilities.flags.writeable
+
+    # The order of the dice doesn't matter, so the cached result is used.
+    _, probabilities = dice_pmf.get_pmf([Die(10), Die(), Die(8)])
+    _, probabilities_2 = dice_pmf.get_pmf([Die(8), Die(10), Die()])
+    assert probabilities is probabilities_2
+
+    # Every total is right to within rounding, even in the far tails,
+    #   for a mix of dice and for enough dice to overflow int64 counts.
+    for sides in [(6, 6, 6, 8, 8, 10, 10, 20, 20), (6,) * 40]:
+        exact = [Fraction(1)]
+        for num_sides in sides:
+            exact = [sum(exact[max(0, i-num_sides+1):i+1], Fraction(0))
+                / num_sides for i in range(len(exact) + num_sides - 1)]
+
+        probabilities = dice_pmf.convolve_pmf(sides)
+        assert len(probabilities) == len(exact)
+        assert (probabilities > 0).all()
+        assert np.allclose(probabilities, [float(p) for p in exact],
+            rtol=1e-15, atol=0)
+
+def test_dice_histogram(chapter_path):
+    chapter_path("chapter_15/rolling_dice")
+    from dice_histogram import DiceHistogram
+    import plotly.graph_objects as go
+
+    histogram = DiceHistogram(range(2, 13))
+    histogram.add(np.array([2, 7, 7, 12]))
+    histogram.add([7])
+    assert histogram.num_rolls == 5
+    assert histogram.frequencies[[0, 5, 10]].tolist() == [1, 3, 1]
+
+    # Histograms from separate workers can be merged.
+    other_histogram = DiceHistogram(range(2, 13))
+    other_histogram.add([3, 3])
+    histogram.merge(other_histogram)
+    assert histogram.num_rolls == 7
+    assert histogram.frequencies[1] == 2
+
+    with pytest.raises(ValueError):
+        histogram.merge(DiceHistogram(range(3, 19)))
+
+    # The bar chart shows the running counts.
+    fig = go.Figure(go.Bar(x=list(histogram.poss_results), y=np.zeros(11)))
+    histogram.update_bar(fig)
+    assert list(fig.data[0].y) == histogram.frequencies.tolist()
+
+# (program, text that should be in the plot's HTML)
+dice_numpy_programs = [
+    ("dice_visual_exact.py", '"name":"Expected"'),
+    ("dice_visual_streaming.py", "10,000,000 Times"),
+]
 
+@pytest.mark.parametrize("test_file, html_text", dice_numpy_programs)
+def test_dice_numpy_program(tmp_path, python_cmd, test_file, html_text):
+    """Run programs that roll with DiceSet. The output isn't compared to a
+    snapshot, because rolls come from NumPy's random number generator.
+    """
+    dice_dir = Path(__file__).parents[1] / "chapter_15" / "rolling_dice"
+    for filename in ["die.py", "dice_numpy.py", "dice_histogram.py",
+            "dice_pmf.py"]:
+        shutil.copy(dice_dir / filename, tmp_path / filename)
 
-def test_eq_explore_data(tmp_path, python_cmd):
+    path = dice_dir / test_file
+    html_name = path.name.replace(".py", ".html")
+    instrument_file(path, tmp_path / path.name, html_name=html_name)
+
+    cmd = f"{python_cmd} {path.name}"
+    output = utils.run_command(cmd, cwd=tmp_path)
 
-    # Copy .py and data files to tmp dir.
+    output_path = tmp_path / path.name.replace(".py", "_nojs.html")
+    assert output_path.exists()
+    print("\n***** Plotly output:", output_path)
+
+    assert html_text in output_path.read_text()
+    assert output == ""
+
+
+def test_eq_explore_data(tmp_path, python_cmd, shared_data_dir, eq_arrays):
+
+    # Copy .py file, and link data file from the shared read-only copy.
     path_py = (Path(__file__).parents[1] / "chapter_16"
         / "mapping_global_datasets" / "eq_explore_data.py")
-    path_data = (path_py.parent / "eq_data"
-        / "eq_data_1_day_m1.geojson")
+    path_data = shared_data_dir / "eq_data" / "eq_data_1_day_m1.geojson"
 
     dest_data_dir = tmp_path / "eq_data"
     dest_data_dir.mkdir()
@@ -109,23 +215,142 @@ def test_eq_explore_data(tmp_path, python_cmd):
     dest_path_data = dest_data_dir / path_data.name
 
     shutil.copy(path_py, dest_path_py)
-    shutil.copy(path_data, dest_path_data)
+    utils.link_file(path_data, dest_path_data)
 
     # Run file.
-    os.chdir(tmp_path)
     cmd = f"{python_cmd} {path_py.name}"
-    output = utils.run_command(cmd)
+    output = utils.run_command(cmd, cwd=tmp_path)
 
     assert output == "[1.6, 1.6, 2.2, 3.7, 2.92000008, 1.4, 4.6, 4.5, 1.9, 1.8]\n[-150.7585, -153.4716, -148.7531, -159.6267, -155.248336791992]\n[61.7591, 59.3152, 63.1633, 54.5612, 18.7551670074463]"
 
-
-def test_eq_world_map(tmp_path, python_cmd):
-
-    # Copy .py and data files to tmp dir.
+    # The program should print the same values as the pre-parsed data.
+    arrays = eq_arrays[path_data.name]
+    assert output.splitlines()[0] == str(arrays["mags"][:10].tolist())
+
+
+@pytest.mark.parametrize("data_file", ["eq_data_1_day_m1.geojson",
+    "eq_data_7_day_m1.geojson", "readable_eq_data.geojson"])
+def test_eq_stream(chapter_path, shared_data_dir, eq_arrays, data_file):
+    """Streamed columns should match the arrays from json.loads()."""
+    chapter_path("chapter_16/mapping_global_datasets")
+    from eq_stream import load_eq_columns
+
+    # A small block size, so features are split across blocks.
+    path = shared_data_dir / "eq_data" / data_file
+    columns = load_eq_columns(path, ("mag", "lon", "lat", "title", "time"),
+        block_size=500)
+
+    arrays = eq_arrays[data_file]
+    for name, array_name in [("mag", "mags"), ("lon", "lons"),
+            ("lat", "lats"), ("title", "titles")]:
+        assert np.array_equal(columns[name], arrays[array_name])
+    assert columns["time"].dtype == np.int64
+
+def test_eq_stream_without_metadata(tmp_path, chapter_path):
+    """Without a count in the metadata, arrays grow as features are read."""
+    chapter_path("chapter_16/mapping_global_datasets")
+    from eq_stream import load_eq_columns
+
+    features = [{"type": "Feature",
+        "properties": {"mag": None if i == 3 else i / 10},
+        "geometry": {"type": "Point", "coordinates": [i, -i, 10]}}
+        for i in range(2_000)]
+    path = tmp_path / "eq_data.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection",
+        "features": features}))
+
+    columns = load_eq_columns(path, ("mag", "lon"))
+    assert len(columns["mag"]) == 2_000
+    assert np.isnan(columns["mag"][3])
+    assert columns["lon"][-1] == 1_999
+
+def test_eq_stream_missing_values(tmp_path, chapter_path):
+    """A null geometry or time is a missing value, not an error."""
+    chapter_path("chapter_16/mapping_global_datasets")
+    from eq_stream import load_eq_columns
+    from eq_catalog import build_catalog
+
+    features = [{"type": "Feature", "id": f"eq{i}",
+        "properties": {"mag": 2.5, "time": 1_000 * i, "title": f"M {i}"},
+        "geometry": {"type": "Point", "coordinates": [i, -i, 10]}}
+        for i in range(5)]
+    features[1]["geometry"] = None
+    features[2]["properties"]["time"] = None
+    features[3]["geometry"]["coordinates"] = [3, -3]
+    path = tmp_path / "eq_data_missing.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection",
+        "metadata": {"count": 5}, "features": features}))
+
+    columns = load_eq_columns(path, ("lon", "lat", "depth", "time"))
+    assert np.isnan(columns["lon"][1]) and np.isnan(columns["lat"][1])
+    assert np.isnan(columns["depth"]).tolist() == [
+        False, True, False, True, False]
+    assert columns["time"].dtype == np.int64
+    assert columns["time"].mask.tolist() == [
+        False, False, True, False, False]
+    assert columns["time"][4] == 4_000
+
+    # The catalog can't index earthquakes without a time or location.
+    catalog = build_catalog(tmp_path / "catalog", [path])
+    assert catalog["title"].tolist() == ["M 0", "M 3", "M 4"]
+
+
+def test_eq_catalog(tmp_path, chapter_path, shared_data_dir):
+    """Indexed queries should match a scan of every earthquake."""
+    chapter_path("chapter_16/mapping_global_datasets")
+    from eq_catalog import build_catalog, EqCatalog
+
+    # The 1-day feed is part of the 7-day feed, so it adds no earthquakes.
+    paths = sorted((shared_data_dir / "eq_data").glob("eq_data_*.geojson"))
+    build_catalog(tmp_path / "catalog", paths)
+    catalog = EqCatalog(tmp_path / "catalog")
+    assert len(catalog) == 1405
+    times = np.asarray(catalog["time"])
+    assert (np.diff(times) >= 0).all()
+
+    # A time window is a slice, so its columns are views.
+    start = catalog.latest_time - np.timedelta64(2, "D")
+    quakes = catalog.query(start=start)
+    assert np.shares_memory(quakes["mag"], catalog["mag"])
+    assert (quakes["time"] >= start.astype(np.int64)).all()
+    assert len(quakes["time"]) == (times >= start.astype(np.int64)).sum()
+
+    # Compare filtered queries against a scan.
+    lons, lats = np.asarray(catalog["lon"]), np.asarray(catalog["lat"])
+    mags = np.asarray(catalog["mag"])
+    bbox = (120, -50, 180, 60)
+    in_bbox = ((lons >= 120) & (lons <= 180) & (lats >= -50) & (lats <= 60))
+    expected = in_bbox & (mags >= 4.5) & (times >= start.astype(np.int64))
+
+    quakes = catalog.query(min_mag=4.5, start=start, bbox=bbox)
+    assert 0 < len(quakes["mag"]) == expected.sum()
+    assert np.array_equal(quakes["title"], catalog["title"][expected])
+
+    quakes = catalog.query(bbox=(-180, -90, 180, 90))
+    assert np.array_equal(quakes["time"], times)
+
+    # A box across the antimeridian is split in two.
+    bbox = (170, -60, -170, 0)
+    in_bbox = (((lons >= 170) | (lons <= -170))
+        & (lats >= -60) & (lats <= 0))
+    assert 0 < in_bbox.sum() < len(catalog)
+    quakes = catalog.query(bbox=bbox)
+    assert np.array_equal(quakes["time"], times[in_bbox])
+
+    with pytest.raises(ValueError, match="min_lat"):
+        catalog.query(bbox=(0, 10, 20, -10))
+
+    quakes = catalog.query(min_mag=2, max_mag=3)
+    assert len(quakes["mag"]) == ((mags >= 2) & (mags <= 3)).sum()
+
+
+def test_eq_world_map(tmp_path, python_cmd, shared_data_dir, snapshots,
+        plotly_version):
+
+    # Link data file into tmp dir, from the shared read-only copy.
     path_py = (Path(__file__).parents[1] / "chapter_16"
         / "mapping_global_datasets" / "eq_world_map.py")
-    path_data = (path_py.parent / "eq_data"
-        / "eq_data_30_day_m1.geojson")
+    path_data = shared_data_dir / "eq_data" / "eq_data_30_day_m1.geojson"
 
     dest_data_dir = tmp_path / "eq_data"
     dest_data_dir.mkdir()
@@ -133,26 +358,16 @@ def test_eq_world_map(tmp_path, python_cmd):
     dest_path_py = tmp_path / path_py.name
     dest_path_data = dest_data_dir / path_data.name
 
-    shutil.copy(path_py, dest_path_py)
-    shutil.copy(path_data, dest_path_data)
-
-    # Modify the program file for testing.
-    lines = dest_path_py.read_text().splitlines()[:-1]
-
-    # Set random seed.
-    lines.insert(0, "import random")
-    lines.insert(6, "random.seed(23)")
-
-    # Write HTML with and without plotly.js.
-    lines = utils.add_plotly_write_commands(path_py, lines)
+    utils.link_file(path_data, dest_path_data)
 
-    contents = "\n".join(lines)
-    dest_path_py.write_text(contents)
+    # Modify the program file for testing: set random seed, and
+    #   write HTML with and without plotly.js instead of calling fig.show().
+    html_name = path_py.name.replace(".py", ".html")
+    instrument_file(path_py, dest_path_py, html_name=html_name, seed=23)
 
     # Run file.
-    os.chdir(tmp_path)
     cmd = f"{python_cmd} {path_py.name}"
-    output = utils.run_command(cmd)
+    output = utils.run_command(cmd, cwd=tmp_path)
 
     # Verify the output file exists.
     output_filename = path_py.name.replace('.py', '_nojs.html')
@@ -163,9 +378,62 @@ def test_eq_world_map(tmp_path, python_cmd):
     # Print output file path, so it's easy to find.
     print("\n***** Plotly output:", output_path)
 
-    reference_file_path = (Path(__file__).parent /
-        "reference_files" / output_filename)
-    assert filecmp.cmp(output_path, reference_file_path)
+    snapshots.check_file("chapter_16/mapping_global_datasets/eq_world_map.py",
+        output_path, plotly_version)
+
+def test_geo_plotting(chapter_path):
+    """Check backend choice, and aggregation into grid cells."""
+    chapter_path("chapter_16/mapping_global_datasets")
+    import geo_plotting
+
+    assert geo_plotting.choose_backend(3_000) == "svg"
+    assert geo_plotting.choose_backend(41_000) == "webgl"
+    assert geo_plotting.choose_backend(500_000) == "grid"
+
+    # Two points share a cell near the origin; one is on the antimeridian.
+    lats = np.array([0.1, 0.4, -89.9])
+    lons = np.array([0.2, 0.3, 180.0])
+    values = np.array([1.0, 3.0, 5.0])
+    cell_lats, cell_lons, counts, means = geo_plotting.aggregate_grid(
+        lats, lons, values, cell_size=0.5)
+    assert counts.tolist() == [1, 2]
+    assert means.tolist() == [5.0, 2.0]
+    assert cell_lats.tolist() == [-89.75, 0.25]
+    assert cell_lons.tolist() == [179.75, 0.25]
+
+    for backend, trace_type in [("svg", "scattergeo"),
+            ("webgl", "scattermapbox"), ("grid", "scattermapbox")]:
+        fig = geo_plotting.plot_points(lats, lons, values, "Test", "Value",
+            backend=backend)
+        assert fig.data[0].type == trace_type
+
+    with pytest.raises(ValueError):
+        geo_plotting.plot_points(lats, lons, values, "Test", "Value",
+            backend="canvas")
+
+def test_world_fires_webgl(tmp_path, python_cmd, shared_data_dir):
+    """Run world_fires_webgl.py, and check that it plots with WebGL."""
+    path_py = (Path(__file__).parents[1] / "chapter_16"
+        / "mapping_global_datasets" / "world_fires_webgl.py")
+    path_data = shared_data_dir / "eq_data" / "world_fires_7_day.csv"
+
+    dest_data_dir = tmp_path / "eq_data"
+    dest_data_dir.mkdir()
+    utils.link_file(path_data, dest_data_dir / path_data.name)
+    shutil.copy(path_py.parent / "geo_plotting.py", tmp_path)
+
+    html_name = path_py.name.replace(".py", ".html")
+    instrument_file(path_py, tmp_path / path_py.name, html_name=html_name)
+
+    cmd = f"{python_cmd} {path_py.name}"
+    output = utils.run_command(cmd, cwd=tmp_path)
+
+    output_path = tmp_path / path_py.name.replace(".py", "_nojs.html")
+    assert output_path.exists()
+    print("\n***** Plotly output:", output_path)
+
+    assert '"type":"scattermapbox"' in output_path.read_text()
+    assert output == ""
 
 def test_python_repos_py(python_cmd):
     """Test python_repos.py, which only makes a GitHub API call.
@@ -203,23 +471,15 @@ def test_python_repos_visual(tmp_path, python_cmd):
     path = (Path(__file__).parents[1] / "chapter_17"
         / "python_repos_visual.py")
     dest_path = tmp_path / path.name
-    shutil.copy(path, dest_path)
 
-    # Modify the program file for testing.
-    lines = dest_path.read_text().splitlines()[:-1]
-
-    # Add a call to fig.write_image().
+    # Modify the program file for testing: call fig.write_image()
+    #   instead of fig.show().
     output_filename = path.name.replace(".py", ".png")
-    save_cmd = f'fig.write_image("{output_filename}")'
-    lines.append(save_cmd)
-
-    contents = "\n".join(lines)
-    dest_path.write_text(contents)
+    instrument_file(path, dest_path, image_name=output_filename)
 
     # Run file.
-    os.chdir(tmp_path)
     cmd = f"{python_cmd} {path.name}"
-    output = utils.run_command(cmd)
+    output = utils.run_command(cmd, cwd=tmp_path)
     output_path = tmp_path / output_filename
 
     # Verify that output file exists.
@@ -269,9 +529,8 @@ def test_hn_submissions(tmp_path, python_cmd):
     dest_path.write_text(contents)
 
     # Run program.
-    os.chdir(tmp_path)
     cmd = f"{python_cmd} {dest_path.name}"
-    output = utils.run_command(cmd)
+    output = utils.run_command(cmd, cwd=tmp_path)
 
     # Check output.
     assert "Status code: 200\nid: " in output
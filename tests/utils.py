@@ -1,16 +1,74 @@
-import subprocess, sys, re
+import subprocess, sys, re, os, shutil, tempfile
 from shlex import split
 from pathlib import Path
 
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
 
-def run_command(cmd):
-    """Run a command, and return the output."""
+
+# Libraries that check_library_version() changed in the test venv.
+#   pytest_sessionfinish() only resets the venv if this is not empty.
+modified_libraries = []
+
+# Usage of each command run through run_command(), for resource
+#   accounting: (pid, cpu time in s, peak RSS in bytes). CPU time and
+#   peak RSS are None where they can't be measured, ie on Windows.
+command_usage = []
+
+
+def run_command(cmd, cwd=None):
+    """Run a command, and return the output.
+    Pass cwd instead of calling os.chdir(), so tests don't change the
+      working directory of the test process.
+    """
     cmd_parts = split(cmd)
-    result = subprocess.run(cmd_parts,
-        capture_output=True, text=True, check=True,
-        encoding="utf-8")
-    
-    return result.stdout.strip()
+    if resource is None:
+        result = subprocess.run(cmd_parts, cwd=cwd,
+            capture_output=True, text=True, check=True,
+            encoding="utf-8")
+        command_usage.append((None, None, None))
+        return result.stdout.strip()
+
+    # Wait for the child with os.wait4(), which returns the child's own
+    #   rusage. Output goes to tmp files, so the child never blocks on a
+    #   full pipe while it's being waited for.
+    with tempfile.TemporaryFile() as stdout, \
+            tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd_parts, cwd=cwd, stdout=stdout,
+            stderr=stderr)
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+        stdout.seek(0)
+        stderr.seek(0)
+        output = stdout.read().decode("utf-8")
+        error_output = stderr.read().decode("utf-8")
+
+    # ru_maxrss is in bytes on macOS, and in KB elsewhere.
+    peak_rss = usage.ru_maxrss
+    if sys.platform != "darwin":
+        peak_rss *= 1024
+    command_usage.append((process.pid, usage.ru_utime + usage.ru_stime,
+        peak_rss))
+
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, cmd_parts,
+            output, error_output)
+
+    # Match the newline handling of text=True.
+    return output.replace("\r\n", "\n").strip()
+
+def link_file(src_path, dest_path):
+    """Hardlink src_path to dest_path, or copy it if that's not possible,
+    ie across filesystems.
+    """
+    try:
+        os.link(src_path, dest_path)
+    except OSError:
+        shutil.copy(src_path, dest_path)
 
 def get_python_cmd():
     """Return path to the venv Python interpreter."""
@@ -21,15 +79,33 @@ def get_python_cmd():
 
     return python_cmd.as_posix()
 
+def get_venv_python_cmd(venv_dir):
+    """Return path to the Python interpreter in venv_dir."""
+    if sys.platform == "win32":
+        python_cmd = Path(venv_dir) / "Scripts/python.exe"
+    else:
+        python_cmd = Path(venv_dir) / "bin/python"
+
+    return python_cmd.as_posix()
+
+def get_site_packages(python_cmd):
+    """Return the site-packages dir for a Python interpreter."""
+    cmd = f"{python_cmd} -c \"import sysconfig; print(sysconfig.get_path('purelib'))\""
+    return run_command(cmd)
+
 def check_library_version(request, python_cmd, lib_name):
     """Install a specific version of a library if needed."""
     lib_version = request.config.getoption(f"--{lib_name}-version")
 
-    if lib_version:
+    # Skip the install if the requested version is already present,
+    #   ie when running in an env built by run_version_matrix.py.
+    if lib_version and lib_version not in get_installed_versions(
+            python_cmd, lib_name):
         print(f"\n*** Installing {lib_name} {lib_version}\n")
         cmd = f"{python_cmd} -m pip install {lib_name}=={lib_version}"
         output = run_command(cmd)
         print(output)
+        modified_libraries.append(lib_name)
 
     # Regardless of what version was requested,
     # show which version is being used.
@@ -42,25 +118,18 @@ def check_library_version(request, python_cmd, lib_name):
 
     print(f"\n*** Running tests with {lib_output}\n")
 
+def get_installed_versions(python_cmd, lib_name):
+    """Return versions of packages whose name matches lib_name."""
+    cmd = f"{python_cmd} -m pip freeze"
+    output = run_command(cmd)
 
-def add_plotly_write_commands(path, lines):
-    """Add commands to write HTML file, with and without plotly.js.
-    I want the usual version with plotly.js, for viewing.
-    But testing against a reference file is more reliable
-      without including plotly.js.
-    """
-    # Add call to fig.write_html()
-    output_filename = path.name.replace(".py", ".html")
-    save_cmd = f'fig.write_html("{output_filename}")'
-    lines.append(save_cmd)
-
-    # Add call to fig.write_html(), without inline plotly.js.
-    output_filename_nojs = output_filename.replace(
-        ".html", "_nojs.html")
-    save_cmd_nojs = f'\nfig.write_html("{output_filename_nojs}", include_plotlyjs=False)'
-    lines.append(save_cmd_nojs)
-
-    return lines
+    versions = []
+    for line in output.splitlines():
+        name, _, version = line.partition("==")
+        if name.lower() == lib_name.lower():
+            versions.append(version)
+
+    return versions
 
 
 def replace_plotly_hash(path):